@@ -129,6 +129,9 @@ def init_rag_service():
     from rag_service.app.models.document import Document
     from rag_service.app.models.chunk import Chunk
     from rag_service.app.models.query import Query
+    from rag_service.app.models.query_rollup import QueryDailyRollup
+    from rag_service.app.models.ingestion_job import IngestionJob
+    from rag_service.app.models.stored_file import StoredFile
     
     print("Initializing RAG service database...")
     
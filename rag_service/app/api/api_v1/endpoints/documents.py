@@ -1,20 +1,49 @@
-from typing import Any, List
+from typing import Any, List, Optional
 import os
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form, status
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only, selectinload
+from starlette.concurrency import run_in_threadpool
 
-from app.db.session import get_db
+from app.api.cursors import decode_cursor, encode_cursor
+from app.db.session import get_async_db
+from app.models.chunk import Chunk
 from app.models.document import Document
-from app.schemas.document import Document as DocumentSchema, DocumentCreate
+from app.models.ingestion_job import IngestionJob
+from app.schemas.document import (
+    Document as DocumentSchema,
+    DocumentCreate,
+    DocumentSummary,
+    DocumentSummaryPage,
+    DocumentUpdate,
+)
+from app.schemas.ingestion import IngestionJob as IngestionJobSchema
 from app.core.auth.dependencies import User, get_current_active_user, check_user_permission
-from app.rag.document_processor import document_processor
+from app.core.tracing import span
+from app.rag.deduplication import promote_duplicate
+from app.rag.document_processor import document_processor, FileTooLargeError
+from app.rag.file_store import file_store
+from app.rag.ingestion import ingestion_queue
+from app.rag.query_cache import query_cache
 
 router = APIRouter()
 
 
+async def _get_document(db: AsyncSession, document_id: int) -> Optional[Document]:
+    """Load a document with its chunks, refreshing it if already in the session."""
+    result = await db.execute(
+        select(Document)
+        .options(selectinload(Document.chunks))
+        .where(Document.id == document_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one_or_none()
+
+
 @router.get("/", response_model=List[DocumentSchema])
 async def read_documents(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     skip: int = 0,
     limit: int = 100,
     current_user: User = Depends(get_current_active_user),
@@ -22,15 +51,89 @@ async def read_documents(
     """
     Retrieve documents owned by the current user.
     """
-    documents = db.query(Document).filter(Document.user_id == current_user.id).offset(skip).limit(limit).all()
-    return documents
+    # Load every document's chunks in one query rather than one per document
+    result = await db.execute(
+        select(Document)
+        .options(selectinload(Document.chunks))
+        .where(Document.user_id == current_user.id)
+        .offset(skip)
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+
+@router.get("/summary", response_model=DocumentSummaryPage)
+async def read_document_summaries(
+    db: AsyncSession = Depends(get_async_db),
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    List the current user's documents, newest first, with metadata and chunk counts only.
+    
+    Content and chunks are never loaded. Pages are fetched by keyset on
+    ``(created_at, id)`` rather than OFFSET, so a deep page costs the same as
+    the first; pass the returned ``next_cursor`` to get the next one.
+    """
+    statement = select(Document).options(
+        load_only(
+            Document.id,
+            Document.title,
+            Document.file_type,
+            Document.file_size,
+            Document.source_document_id,
+            Document.embedding_status,
+            Document.created_at,
+            Document.updated_at,
+        )
+    ).where(Document.user_id == current_user.id)
+    if cursor is not None:
+        created_at, document_id = decode_cursor(cursor)
+        statement = statement.where(tuple_(Document.created_at, Document.id) < tuple_(created_at, document_id))
+    result = await db.execute(
+        statement.order_by(Document.created_at.desc(), Document.id.desc()).limit(limit + 1)
+    )
+    documents = result.scalars().all()
+    has_more = len(documents) > limit
+    documents = documents[:limit]
+    
+    # Count chunks for the whole page at once; duplicates count their source's chunks
+    index_ids = {document.index_document_id for document in documents}
+    chunk_counts = {}
+    if index_ids:
+        result = await db.execute(
+            select(Chunk.document_id, func.count(Chunk.id))
+            .where(Chunk.document_id.in_(index_ids))
+            .group_by(Chunk.document_id)
+        )
+        chunk_counts = dict(result.all())
+    
+    items = [
+        DocumentSummary(
+            id=document.id,
+            title=document.title,
+            file_type=document.file_type,
+            file_size=document.file_size,
+            source_document_id=document.source_document_id,
+            embedding_status=bool(document.embedding_status),
+            chunk_count=chunk_counts.get(document.index_document_id, 0),
+            created_at=document.created_at,
+            updated_at=document.updated_at,
+        )
+        for document in documents
+    ]
+    return DocumentSummaryPage(
+        items=items,
+        next_cursor=encode_cursor(documents[-1].created_at, documents[-1].id) if has_more else None
+    )
 
 
 @router.post("/", response_model=DocumentSchema)
 async def upload_document(
     file: UploadFile = File(...),
     title: str = Form(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
@@ -40,8 +143,11 @@ async def upload_document(
         # Detect file type
         file_type = document_processor.detect_file_type(file.filename)
         
-        # Save the file
-        file_path = document_processor.save_uploaded_file(file, current_user.id)
+        # Stream the file to disk off the event loop
+        saved_file = await run_in_threadpool(document_processor.save_uploaded_file, file, current_user.id)
+        
+        # Store the bytes once per content hash
+        file_path = await db.run_sync(file_store.acquire, saved_file)
         
         # Create document in DB
         document_in = DocumentCreate(
@@ -54,20 +160,28 @@ async def upload_document(
             title=document_in.title,
             file_type=document_in.file_type,
             file_path=file_path,
+            content_hash=saved_file.content_hash,
+            file_size=saved_file.size,
             user_id=document_in.user_id,
             embedding_status=False,
             content=None
         )
         
         db.add(document)
-        db.commit()
-        db.refresh(document)
+        await db.commit()
         
-        return document
+        return await _get_document(db, document.id)
+    except FileTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e),
+        )
     except Exception as e:
-        # Clean up file if operation failed
-        if "file_path" in locals() and os.path.exists(file_path):
-            os.remove(file_path)
+        # Clean up the staged file if operation failed; a stored file is
+        # only referenced once the transaction commits
+        await db.rollback()
+        if "saved_file" in locals() and os.path.exists(saved_file.path):
+            os.remove(saved_file.path)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to upload document: {str(e)}",
@@ -77,13 +191,13 @@ async def upload_document(
 @router.get("/{document_id}", response_model=DocumentSchema)
 async def read_document(
     document_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
     Get a specific document by ID.
     """
-    document = db.query(Document).filter(Document.id == document_id).first()
+    document = await _get_document(db, document_id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
@@ -94,16 +208,74 @@ async def read_document(
     return document
 
 
+@router.put("/{document_id}", response_model=DocumentSchema)
+async def update_document(
+    document_id: int,
+    document_in: DocumentUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Update a document's title or content.
+
+    Changing the content of a processed document queues it for
+    reprocessing, which only embeds the chunks that changed.
+    """
+    document = await _get_document(db, document_id)
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    # Check if user owns the document
+    if document.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    title_changed = document_in.title is not None and document_in.title != document.title
+    if title_changed:
+        document.title = document_in.title
+    
+    content_changed = document_in.content is not None and document_in.content != document.content
+    reprocess = content_changed and (document.embedding_status or document.source_document_id is not None)
+    if content_changed:
+        if document.source_document_id is not None:
+            # Stop sharing the duplicate's chunks; this document gets its own
+            document.source_document_id = None
+            document.embedding_status = False
+        elif document.embedding_status and await db.run_sync(promote_duplicate, document) is not None:
+            # Duplicates keep the old chunks; this document starts afresh
+            document.embedding_status = False
+        
+        # The uploaded file no longer matches the document
+        if document.content_hash:
+            await db.run_sync(file_store.release, document.content_hash)
+        document.file_path = None
+        document.content_hash = None
+        document.file_size = None
+        document.content = document_in.content
+    
+    db.add(document)
+    await db.commit()
+    
+    # Cached responses quote the title as well as the content
+    if content_changed or title_changed:
+        query_cache.invalidate_document(document.id)
+    if reprocess:
+        await db.run_sync(
+            lambda session: ingestion_queue.enqueue(session, document, current_user.id, content_changed=True)
+        )
+    
+    return await _get_document(db, document.id)
+
+
 @router.delete("/{document_id}")
 async def delete_document(
     document_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
     Delete a document.
     """
-    document = db.query(Document).filter(Document.id == document_id).first()
+    document = await db.get(Document, document_id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
@@ -111,27 +283,44 @@ async def delete_document(
     if document.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    # Delete the file
-    if document.file_path and os.path.exists(document.file_path):
+    # Hand chunks and vectors over to a duplicate if other documents share them,
+    # otherwise delete the vectors with the document
+    if document.source_document_id is None and document.embedding_status:
+        if await db.run_sync(promote_duplicate, document) is None:
+            from app.rag.embeddings import embedding_manager
+            await run_in_threadpool(embedding_manager.delete_document_embeddings, document.id)
+    
+    # Delete the file once no other document references it
+    if document.content_hash:
+        await db.run_sync(file_store.release, document.content_hash)
+    elif document.file_path and os.path.exists(document.file_path):
         os.remove(document.file_path)
     
     # Delete from database
-    db.delete(document)
-    db.commit()
+    await db.delete(document)
+    await db.commit()
+    query_cache.invalidate_document(document_id)
     
     return {"status": "success", "message": "Document deleted successfully"}
 
 
-@router.post("/{document_id}/process")
+@router.post(
+    "/{document_id}/process",
+    response_model=IngestionJobSchema,
+    status_code=status.HTTP_202_ACCEPTED,
+)
 async def process_document(
     document_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
-    Process a document (extract text, create chunks, generate embeddings).
+    Queue a document for processing (extract text, create chunks, generate embeddings).
+
+    Returns the ingestion job; poll GET /documents/jobs/{job_id} for its progress.
     """
-    document = db.query(Document).filter(Document.id == document_id).first()
+    with span("document_lookup"):
+        document = await db.get(Document, document_id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
@@ -139,42 +328,26 @@ async def process_document(
     if document.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    try:
-        # Extract text
-        if not document.content:
-            document.content = document_processor.load_document(document.file_path, document.file_type)
-            db.add(document)
-            db.commit()
-            db.refresh(document)
-        
-        # Create chunks
-        chunks = document_processor.split_text_into_chunks(document.content)
-        
-        # Generate embeddings and store them in the vector DB
-        from app.rag.embeddings import embedding_manager
-        from app.models.chunk import Chunk
-        
-        # Create embeddings
-        embedding_ids = embedding_manager.create_document_embeddings(chunks, document.id)
-        
-        # Store chunks in database with embedding IDs
-        for i, (chunk_text, embedding_id) in enumerate(zip(chunks, embedding_ids)):
-            chunk = Chunk(
-                content=chunk_text,
-                document_id=document.id,
-                embedding_id=embedding_id
-            )
-            db.add(chunk)
-        
-        # Update document status
-        document.embedding_status = True
-        db.add(document)
-        db.commit()
-        
-        return {"status": "success", "message": "Document processed successfully", "chunks_count": len(chunks)}
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to process document: {str(e)}",
-        ) 
\ No newline at end of file
+    # Enqueuing commits the job, or finds the one already queued
+    with span("enqueue"):
+        return await db.run_sync(lambda session: ingestion_queue.enqueue(session, document, current_user.id))
+
+
+@router.get("/jobs/{job_id}", response_model=IngestionJobSchema)
+async def read_ingestion_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Get the status of a document processing job.
+    """
+    job = await db.get(IngestionJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    # Check if user owns the job
+    if job.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    return job
@@ -1,137 +1,455 @@
-from typing import Any, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Body, status
-from sqlalchemy.orm import Session
+import asyncio
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+from fastapi import APIRouter, Depends, HTTPException, Body, Query as QueryParam, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+import anyio
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import iterate_in_threadpool
 import json
+import re
+import time
 
-from app.db.session import get_db
+from app.api.cursors import decode_cursor, encode_cursor
+from app.core.config import settings
+from app.core.metrics import stage_timer
+from app.core.tracing import run_traced, span
+from app.db.session import get_async_db
 from app.models.query import Query
+from app.models.query_rollup import QueryDailyRollup
 from app.models.document import Document
-from app.schemas.query import Query as QuerySchema, QueryCreate
+from app.schemas.query import Query as QuerySchema, QueryCreate, QueryDailyStats
 from app.core.auth.dependencies import User, get_current_active_user
+from app.rag.query_cache import query_cache
+from app.rag.query_log import query_log
 
 router = APIRouter()
 
 
+def split_tokens(text: str) -> List[str]:
+    """Split text into words, each with the whitespace before it, so the pieces join back to the text."""
+    return re.findall(r"\s*\S+|\s+", text)
+
+
+def general_response(query_text: str) -> str:
+    """Response to a query without document context."""
+    response = f"You asked: {query_text}\n\n"
+    response += "This is a simulated response that would normally be generated by an LLM."
+    return response
+
+
+def retrieve_document_chunks(
+    document: Document,
+    query_text: str,
+    search_mode: str,
+    query_embedding: Optional[Sequence[float]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Retrieve the chunks of a document most relevant to a query.
+    """
+    from app.rag.embeddings import embedding_manager
+    
+    return embedding_manager.search_similar_chunks(
+        query=query_text,
+        document_id=document.index_document_id,
+        top_k=3,
+        search_mode=search_mode,
+        query_embedding=query_embedding
+    )
+
+
+def iter_response_tokens(document: Document, search_results: List[Dict[str, Any]]) -> Iterator[str]:
+    """
+    Generate a response from retrieved chunks, a piece at a time.
+    
+    Stands in for an LLM's token stream, yielding the simulated response
+    word by word.
+    """
+    # Build context from search results
+    context = "\n\n".join([result["content"] for result in search_results])
+    
+    # Simulate a response based on the context (in a real app, we'd use an LLM here)
+    response = f"Based on the document, I can provide this information:\n\n"
+    response += f"The document contains information about {document.title}.\n"
+    response += f"Here's a summary based on the document content: This is a simulated response that would normally be generated by an LLM using the context from the document."
+    
+    # You could also include top chunks in the response for debugging
+    response += f"\n\nTop relevant chunks:\n"
+    for i, result in enumerate(search_results):
+        response += f"\n{i+1}. {result['content'][:100]}... (score: {result['score']:.2f})"
+    
+    yield from split_tokens(response)
+
+
+def generate_document_response(
+    document: Document,
+    query_text: str,
+    search_mode: str,
+    query_embedding: Optional[Sequence[float]] = None
+) -> str:
+    """
+    Retrieve the chunks most relevant to a query and build a response from them.
+    """
+    search_results = retrieve_document_chunks(document, query_text, search_mode, query_embedding)
+    with stage_timer("response_assembly"):
+        return "".join(iter_response_tokens(document, search_results))
+
+
+def lookup_cached_response(
+    document: Document, query_text: str, search_mode: str
+) -> Tuple[Optional[str], Optional[Sequence[float]]]:
+    """
+    Look a query up in the query cache.
+    
+    Returns the cached response, or None, and the query's embedding if the
+    lookup computed it.
+    """
+    from app.rag.embeddings import embedding_manager
+    
+    if not settings.QUERY_CACHE_ENABLED:
+        return None, None
+    # Identical (or, if enabled, similar) earlier queries reuse their response
+    with span("query_cache"):
+        return query_cache.lookup(
+            query_text,
+            document.id,
+            search_mode,
+            embed=embedding_manager.embed_query if search_mode != "keyword" else None
+        )
+
+
+def answer_document_query(document: Document, query_text: str, search_mode: str) -> str:
+    """
+    Answer a query about a document, from the query cache when possible.
+    
+    Blocks on embedding and vector search, so async callers run it in a
+    thread.
+    """
+    response, query_embedding = lookup_cached_response(document, query_text, search_mode)
+    if response is None:
+        response = generate_document_response(document, query_text, search_mode, query_embedding)
+        if settings.QUERY_CACHE_ENABLED:
+            query_cache.put(query_text, document.id, search_mode, response, query_embedding)
+    return response
+
+
+async def get_queried_document(db: AsyncSession, query_in: QueryCreate, current_user: User) -> Optional[Document]:
+    """
+    Load the document a query is about, checking the user may query it.
+    
+    Returns None for queries without document context.
+    """
+    if not query_in.document_id:
+        return None
+    
+    with span("document_lookup"):
+        document = await db.get(Document, query_in.document_id)
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    if document.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions to access this document")
+    
+    if not document.embedding_status:
+        raise HTTPException(
+            status_code=400,
+            detail="Document has not been processed yet. Please process the document first."
+        )
+    return document
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format a server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
 @router.post("/", response_model=QuerySchema)
 async def create_query(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     query_in: QueryCreate = Body(...),
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
     Create a new query and generate a response using RAG.
+    
+    The response is returned as soon as it is ready; the query is written
+    to the database in the background by the query log. Until then it can
+    only be read back from the process that answered it, and it is lost
+    if the write keeps failing (see ``QueryLogWriter``).
     """
     # Check if document exists and user has access to it
-    if query_in.document_id:
-        document = db.query(Document).filter(Document.id == query_in.document_id).first()
-        if not document:
-            raise HTTPException(status_code=404, detail="Document not found")
-        
-        if document.user_id != current_user.id:
-            raise HTTPException(status_code=403, detail="Not enough permissions to access this document")
-        
-        if not document.embedding_status:
-            raise HTTPException(
-                status_code=400,
-                detail="Document has not been processed yet. Please process the document first."
-            )
-    
-    # Create the query
-    query = Query(
-        query_text=query_in.query_text,
-        user_id=current_user.id,
-        document_id=query_in.document_id,
-        response="Processing..."  # Initial response while we process
-    )
-    db.add(query)
-    db.commit()
-    db.refresh(query)
+    document = await get_queried_document(db, query_in, current_user)
     
+    search_mode = query_in.search_mode.value
+    start = time.perf_counter()
     try:
-        # Import embedding manager
-        from app.rag.embeddings import embedding_manager
-        
-        if query_in.document_id:
-            # Use embedding manager to search for relevant chunks
-            search_results = embedding_manager.search_similar_chunks(
-                query=query_in.query_text,
-                document_id=query_in.document_id,
-                top_k=3
-            )
-            
-            # Build context from search results
-            context = "\n\n".join([result["content"] for result in search_results])
-            
-            # Simulate a response based on the context (in a real app, we'd use an LLM here)
-            response = f"Based on the document, I can provide this information:\n\n"
-            response += f"The document contains information about {document.title}.\n"
-            response += f"Here's a summary based on the document content: This is a simulated response that would normally be generated by an LLM using the context from the document."
-            
-            # You could also include top chunks in the response for debugging
-            response += f"\n\nTop relevant chunks:\n"
-            for i, result in enumerate(search_results):
-                response += f"\n{i+1}. {result['content'][:100]}... (score: {result['score']:.2f})"
+        if document is not None:
+            with span("answer"):
+                response = await run_traced(
+                    answer_document_query, document, query_in.query_text, search_mode
+                )
         else:
             # General query without document context
-            response = f"You asked: {query_in.query_text}\n\n"
-            response += "This is a simulated response that would normally be generated by an LLM."
-        
-        # Update the query with the response
-        query.response = response
-        db.add(query)
-        db.commit()
-        db.refresh(query)
-        
-        return query
+            response = general_response(query_in.query_text)
     except Exception as e:
-        # Update with error message
-        query.response = f"Error generating response: {str(e)}"
-        db.add(query)
-        db.commit()
+        # Log the failed query with the error as its response
+        await query_log.record(
+            query_in.query_text,
+            current_user.id,
+            query_in.document_id,
+            f"Error generating response: {str(e)}",
+            search_mode=search_mode,
+            latency_ms=(time.perf_counter() - start) * 1000
+        )
         
         # Re-raise for API response
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to generate response: {str(e)}",
         )
+    
+    # The query is written to the database in the background
+    with span("query_log"):
+        return await query_log.record(
+            query_in.query_text,
+            current_user.id,
+            query_in.document_id,
+            response,
+            search_mode=search_mode,
+            latency_ms=(time.perf_counter() - start) * 1000
+        )
+
+
+@router.post("/stream")
+async def stream_query(
+    *,
+    db: AsyncSession = Depends(get_async_db),
+    query_in: QueryCreate = Body(...),
+    current_user: User = Depends(get_current_active_user),
+) -> StreamingResponse:
+    """
+    Create a new query and stream its response as server-sent events.
+    
+    Sends a ``chunks`` event with the retrieved chunks as soon as search is
+    done (none when the response comes from the query cache), then a
+    ``token`` event for each piece of the response as it is generated, and
+    finally a ``done`` event with the query, once it is in the query log.
+    If generation fails, an ``error`` event is sent instead of ``done``. If
+    the client disconnects first, the query is logged with the part of the
+    response it was sent, marked as cancelled, and is not cached.
+    
+    The ``Server-Timing`` header of a traced request is sent before any
+    event, so it only covers the document lookup; the complete trace,
+    including the ``answer`` span, is only in the TRACE_EXPORT_PATH export.
+    """
+    # Check access before the stream starts, so errors get a status code
+    document = await get_queried_document(db, query_in, current_user)
+    search_mode = query_in.search_mode.value
+    
+    async def events() -> AsyncIterator[str]:
+        start = time.perf_counter()
+        parts: List[str] = []
+        generated = False
+        try:
+            # Same span and stage as create_query, so streamed and plain
+            # queries show up alike in traces and metrics
+            with span("answer") if document is not None else nullcontext():
+                if document is None:
+                    tokens = iter(split_tokens(general_response(query_in.query_text)))
+                else:
+                    cached, query_embedding = await run_traced(
+                        lookup_cached_response, document, query_in.query_text, search_mode
+                    )
+                    if cached is not None:
+                        tokens = iter(split_tokens(cached))
+                    else:
+                        search_results = await run_traced(
+                            retrieve_document_chunks, document, query_in.query_text, search_mode, query_embedding
+                        )
+                        yield sse_event("chunks", search_results)
+                        tokens = iter_response_tokens(document, search_results)
+                        generated = True
+                
+                # Includes any time spent waiting for the client to read the stream
+                with stage_timer("response_assembly") if generated else nullcontext():
+                    # Generation may block, so pull each token on a worker thread
+                    async for token in iterate_in_threadpool(tokens):
+                        parts.append(token)
+                        yield sse_event("token", {"text": token})
+            response = "".join(parts)
+            
+            if generated and settings.QUERY_CACHE_ENABLED:
+                await run_traced(
+                    query_cache.put, query_in.query_text, document.id, search_mode, response, query_embedding
+                )
+        except (GeneratorExit, asyncio.CancelledError):
+            # The client went away: log what it was sent, as create_query logs
+            # every query. The disconnect cancels the stream's scope, so the
+            # write is shielded from it.
+            with anyio.CancelScope(shield=True):
+                await query_log.record(
+                    query_in.query_text,
+                    current_user.id,
+                    query_in.document_id,
+                    f"Response cancelled by client: {''.join(parts)}",
+                    search_mode=search_mode,
+                    latency_ms=(time.perf_counter() - start) * 1000
+                )
+            raise
+        except Exception as e:
+            # Log the failed query with the error as its response
+            await query_log.record(
+                query_in.query_text,
+                current_user.id,
+                query_in.document_id,
+                f"Error generating response: {str(e)}",
+                search_mode=search_mode,
+                latency_ms=(time.perf_counter() - start) * 1000
+            )
+            yield sse_event("error", {"detail": f"Failed to generate response: {str(e)}"})
+            return
+        
+        record = await query_log.record(
+            query_in.query_text,
+            current_user.id,
+            query_in.document_id,
+            response,
+            search_mode=search_mode,
+            latency_ms=(time.perf_counter() - start) * 1000
+        )
+        yield sse_event("done", QuerySchema(**record))
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Stop proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _query_sort_key(query: Union[Query, Dict[str, Any]]) -> Tuple[datetime, int]:
+    """``(created_at, id)`` of a stored query or a record still in the query log."""
+    if isinstance(query, dict):
+        return query["created_at"], query["id"]
+    return query.created_at, query.id
 
 
 @router.get("/", response_model=List[QuerySchema])
 async def read_queries(
-    db: Session = Depends(get_db),
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
     skip: int = 0,
-    limit: int = 100,
+    limit: int = QueryParam(100, ge=1, le=1000),
     document_id: Optional[int] = None,
+    before: Optional[datetime] = None,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
-    Retrieve queries created by the current user.
+    Retrieve queries created by the current user, newest first.
+    
+    To page through history, pass the ``X-Next-Cursor`` header of the
+    previous page as ``cursor`` rather than using ``skip``. Pages are
+    fetched by keyset on ``(created_at, id)``, so each one is an index range
+    scan that only touches the months it covers. ``before`` limits the
+    listing to queries made before a time.
     """
-    query = db.query(Query).filter(Query.user_id == current_user.id)
+    statement = select(Query).where(Query.user_id == current_user.id)
     
     if document_id:
-        query = query.filter(Query.document_id == document_id)
+        statement = statement.where(Query.document_id == document_id)
+    if before is not None:
+        # Timestamps are stored as naive UTC
+        if before.tzinfo is not None:
+            before = before.astimezone(timezone.utc).replace(tzinfo=None)
+        statement = statement.where(Query.created_at < before)
+    if cursor is not None:
+        after = decode_cursor(cursor)
+        statement = statement.where(tuple_(Query.created_at, Query.id) < tuple_(*after))
+    
+    result = await db.execute(
+        statement.order_by(Query.created_at.desc(), Query.id.desc()).offset(skip).limit(limit + 1)
+    )
+    queries = list(result.scalars().all())
     
-    queries = query.offset(skip).limit(limit).all()
-    return queries
+    # Include recent queries that have not been written yet
+    if skip == 0:
+        written = {query.id for query in queries}
+        pending = [
+            record for record in query_log.list_pending(current_user.id, document_id)
+            if record["id"] not in written
+            and (before is None or record["created_at"] < before)
+            and (cursor is None or (record["created_at"], record["id"]) < after)
+        ]
+        queries = sorted(pending + queries, key=_query_sort_key, reverse=True)
+    
+    if len(queries) > limit:
+        created_at, query_id = _query_sort_key(queries[limit - 1])
+        response.headers["X-Next-Cursor"] = encode_cursor(created_at, query_id)
+    return queries[:limit]
+
+
+@router.get("/cache/stats")
+async def read_query_cache_stats(
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Get hit ratios and size of the query response cache (superusers only).
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    return query_cache.stats()
+
+
+@router.get("/stats/daily", response_model=List[QueryDailyStats])
+async def read_daily_query_stats(
+    db: AsyncSession = Depends(get_async_db),
+    days: int = QueryParam(30, ge=1, le=366),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Get the current user's daily query counts and latency, newest day first.
+    
+    Served from rollups refreshed by the query history maintenance job, so
+    today's figures may lag by up to QUERY_MAINTENANCE_INTERVAL_SECONDS.
+    """
+    since = datetime.now(timezone.utc).date() - timedelta(days=days - 1)
+    result = await db.execute(
+        select(QueryDailyRollup)
+        .where(QueryDailyRollup.user_id == current_user.id, QueryDailyRollup.day >= since)
+        .order_by(QueryDailyRollup.day.desc())
+    )
+    return result.scalars().all()
 
 
 @router.get("/{query_id}", response_model=QuerySchema)
 async def read_query(
     query_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
     Get a specific query by ID.
+    
+    A query that the query log has not written yet is only found by the
+    process that answered it; other workers return 404 until it is flushed.
     """
-    query = db.query(Query).filter(Query.id == query_id).first()
+    query = query_log.get_pending(query_id)
+    if query is None:
+        # The primary key includes created_at, so look the ID up in every partition
+        result = await db.execute(select(Query).where(Query.id == query_id))
+        query = result.scalars().first()
     if not query:
         raise HTTPException(status_code=404, detail="Query not found")
     
     # Check if user owns the query
-    if query.user_id != current_user.id:
+    user_id = query["user_id"] if isinstance(query, dict) else query.user_id
+    if user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
     return query 
\ No newline at end of file
@@ -0,0 +1,29 @@
+import base64
+import binascii
+from datetime import datetime, timezone
+from typing import Tuple
+
+from fastapi import HTTPException
+
+
+def encode_cursor(created_at: datetime, id_: int) -> str:
+    """Opaque cursor for keyset pagination on ``(created_at, id)``."""
+    raw = f"{created_at.isoformat()}|{id_}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decode a cursor made by ``encode_cursor``, raising a 400 error if it is malformed.
+
+    Timestamps are stored as naive UTC, so a cursor carrying a UTC offset is
+    converted to naive UTC before it is compared with them.
+    """
+    try:
+        created_at, id_ = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        created_at, id_ = datetime.fromisoformat(created_at), int(id_)
+    except (ValueError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return created_at, id_
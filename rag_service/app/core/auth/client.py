@@ -0,0 +1,70 @@
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.metrics import outbound_timer
+
+
+class UserServiceClient:
+    """
+    Shared async HTTP client for calls from the RAG service to the user service.
+
+    A single ``httpx.AsyncClient`` is created on application startup and closed
+    on shutdown, so connections are kept alive and reused across requests
+    instead of being opened per call.
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def startup(self) -> None:
+        """Create the pooled client."""
+        if self._client is not None:
+            return
+        self._client = httpx.AsyncClient(
+            base_url=f"{settings.USER_SERVICE_URL}{settings.API_V1_STR}",
+            timeout=httpx.Timeout(
+                settings.USER_SERVICE_TIMEOUT_SECONDS,
+                connect=settings.USER_SERVICE_CONNECT_TIMEOUT_SECONDS,
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.USER_SERVICE_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.USER_SERVICE_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.USER_SERVICE_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+        )
+
+    async def shutdown(self) -> None:
+        """Close the pooled client and all of its connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            raise RuntimeError("User service client has not been started")
+        return self._client
+
+    async def get_current_user(self, token: str) -> httpx.Response:
+        """Fetch the user that owns the token."""
+        with outbound_timer("user_service", "get_current_user"):
+            return await self.client.get(
+                "/users/me",
+                headers={"Authorization": f"Bearer {token}"},
+            )
+
+    async def check_permission(self, token: str, action: str, resource: str) -> httpx.Response:
+        """Ask the user service whether the token's user may perform an action."""
+        payload: Dict[str, Any] = {"action": action, "resource": resource}
+        with outbound_timer("user_service", "check_permission"):
+            return await self.client.post(
+                "/permissions/check",
+                json=payload,
+                headers={"Authorization": f"Bearer {token}"},
+            )
+
+
+# Create a global instance
+user_service_client = UserServiceClient()
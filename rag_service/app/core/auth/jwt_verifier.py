@@ -0,0 +1,62 @@
+from typing import Any, Dict, Optional, Union
+
+import httpx
+from jose import jwt
+
+from app.core.config import settings
+
+
+class LocalTokenVerifier:
+    """
+    Verify access tokens issued by the user service without calling it.
+
+    The signature and expiry are checked with either the shared secret
+    (``JWT_SECRET_KEY``) or a key set fetched once from ``JWT_JWKS_URL`` on
+    startup. User details are read from the token claims.
+    """
+
+    REQUIRED_CLAIMS = ("sub", "email", "is_active", "is_superuser")
+
+    def __init__(self):
+        self._key: Optional[Union[str, Dict[str, Any]]] = settings.JWT_SECRET_KEY or None
+
+    @property
+    def enabled(self) -> bool:
+        return settings.AUTH_MODE == "local"
+
+    async def load_keys(self) -> None:
+        """Fetch the key set once if one is configured."""
+        if not self.enabled:
+            return
+        if not settings.JWT_JWKS_URL:
+            if self._key is None:
+                raise RuntimeError("AUTH_MODE=local requires JWT_SECRET_KEY or JWT_JWKS_URL")
+            return
+        async with httpx.AsyncClient(timeout=settings.USER_SERVICE_TIMEOUT_SECONDS) as client:
+            response = await client.get(settings.JWT_JWKS_URL)
+            response.raise_for_status()
+            self._key = response.json()
+
+    def verify(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        Decode and verify a token.
+
+        Returns the user fields taken from the claims, or None if the token
+        was issued without them (e.g. before the claims were added) and has to
+        be validated by the user service instead. Raises ``JWTError`` if the
+        signature or expiry check fails.
+        """
+        payload = jwt.decode(token, self._key, algorithms=[settings.JWT_ALGORITHM])
+        if any(claim not in payload for claim in self.REQUIRED_CLAIMS):
+            return None
+        return {
+            "id": int(payload["sub"]),
+            "email": payload["email"],
+            "is_active": payload["is_active"],
+            "is_superuser": payload["is_superuser"],
+            "full_name": payload.get("full_name"),
+        }
+
+
+# Create a global instance
+local_token_verifier = LocalTokenVerifier()
@@ -0,0 +1,122 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from jose import jwt, JWTError
+
+from app.core.config import settings
+
+
+class TokenCache:
+    """
+    In-process LRU cache of validated tokens.
+
+    Entries are keyed by the SHA-256 of the token so raw bearer tokens are
+    never kept in memory longer than the request that carried them. Each entry
+    lives for at most ``ttl`` seconds and never past the token's ``exp`` claim.
+    Concurrent misses for the same token share a single load.
+
+    The cache is only used from the event loop, so no locking is needed.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._in_flight: Dict[str, "asyncio.Future[Any]"] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def _expires_at(self, token: str, now: float) -> float:
+        """Compute when an entry for this token must expire."""
+        expires_at = now + self.ttl
+        try:
+            exp = jwt.get_unverified_claims(token).get("exp")
+        except JWTError:
+            exp = None
+        if isinstance(exp, (int, float)):
+            # Convert the wall-clock expiry into the monotonic clock we use
+            expires_at = min(expires_at, now + (exp - time.time()))
+        return expires_at
+
+    async def get_or_load(self, token: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached value for a token, awaiting ``loader`` on a miss.
+
+        Only one load per token runs at a time; concurrent callers await the
+        same task. Exceptions raised by the loader are propagated to every
+        waiter and are not cached.
+        """
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+
+        self.misses += 1
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, token, loader))
+            self._in_flight[key] = task
+        else:
+            self.coalesced += 1
+
+        # Shield the shared load so one cancelled request does not fail the others
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, token: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await loader()
+        finally:
+            self._in_flight.pop(key, None)
+
+        now = time.monotonic()
+        expires_at = self._expires_at(token, now)
+        if expires_at > now:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, token: str) -> None:
+        """Drop a single token from the cache."""
+        self._entries.pop(self._key(token), None)
+
+    def clear(self) -> None:
+        """Drop all cached entries and reset the counters."""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current cache size."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+        }
+
+
+# Create a global instance
+token_cache = TokenCache(
+    max_size=settings.TOKEN_CACHE_MAX_SIZE,
+    ttl=settings.TOKEN_CACHE_TTL_SECONDS,
+)
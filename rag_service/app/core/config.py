@@ -39,21 +39,126 @@ class Settings(BaseSettings):
             path=f"/{values.get('POSTGRES_DB') or ''}",
         )
 
+    # Async engine connection pool; each worker process has its own pool
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10  # Extra connections opened beyond DB_POOL_SIZE under load
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0  # Wait for a free connection before failing
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+
     USER_SERVICE_URL: str = "http://localhost:8000"
+    USER_SERVICE_TIMEOUT_SECONDS: float = 5.0
+    USER_SERVICE_CONNECT_TIMEOUT_SECONDS: float = 2.0
+    USER_SERVICE_MAX_CONNECTIONS: int = 100
+    USER_SERVICE_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    USER_SERVICE_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+
+    # Token verification settings
+    AUTH_MODE: str = "remote"  # Options: remote (ask the user service), local (verify the JWT in-process)
+    JWT_SECRET_KEY: str = ""  # Must match the user service's SECRET_KEY for local mode
+    JWT_ALGORITHM: str = "HS256"
+    JWT_JWKS_URL: Optional[str] = None  # Key set fetched once on startup instead of a shared key
+
+    # Token validation cache settings
+    TOKEN_CACHE_TTL_SECONDS: int = 30  # Never exceeds the token's own expiry
+    TOKEN_CACHE_MAX_SIZE: int = 10000
     
     # Document storage settings
     UPLOAD_FOLDER: str = "uploads"
     MAX_CONTENT_LENGTH: int = 16 * 1024 * 1024  # 16MB max upload size
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # Uploads are written to disk in blocks of this size
+    STREAM_BLOCK_SIZE: int = 1024 * 1024  # Characters of text read at a time during ingestion
+    PDF_EXTRACTION_WORKERS: int = 0  # Processes extracting PDF pages; 0 uses every CPU
+    PDF_PAGES_PER_TASK: int = 8  # Pages extracted per process pool task
+    PDF_PARALLEL_MIN_PAGES: int = 32  # Smaller PDFs are extracted without the process pool
+
+    # Chunking settings
+    CHUNKING_STRATEGY: str = "token"  # Options: token, paragraph (1000-character paragraph groups)
+    CHUNK_ENCODING: str = "cl100k_base"  # tiktoken encoding used to count tokens
+    CHUNK_SIZE_TOKENS: int = 512  # Target chunk size
+    CHUNK_MIN_TOKENS: int = 256  # Chunks end at the best boundary between this and CHUNK_SIZE_TOKENS
+    CHUNK_OVERLAP_TOKENS: int = 64  # Tokens shared by consecutive chunks
+    CHUNK_MAX_TOKENS: int = 1024  # Hard limit when there is no boundary within CHUNK_SIZE_TOKENS
+    CHUNK_ENCODE_THREADS: int = 0  # Threads tokenizing each block in parallel; 0 uses every available CPU
+
+    # Background ingestion settings
+    INGESTION_CONCURRENCY: int = 2  # Jobs processed at once per service process
+    INGESTION_POLL_INTERVAL_SECONDS: float = 5.0
+    INGESTION_LEASE_SECONDS: int = 60  # A job is retried if its worker stops renewing the lease
+    INGESTION_MAX_ATTEMPTS: int = 3
+    CHUNK_INSERT_BATCH_SIZE: int = 1000  # Chunk rows written per executemany batch
+    CHUNK_STREAM_BATCH_SIZE: int = 256  # Chunks diffed, embedded and written together while streaming
     
     # LLM settings
     DEFAULT_MODEL: str = "gpt-3.5-turbo"
     OPENAI_API_KEY: str = ""
-    EMBEDDING_MODEL: str = "text-embedding-ada-002"
+    EMBEDDING_PROVIDER: str = "openai"  # Options: openai, hashing (local, CPU-only)
+    EMBEDDING_MODEL: str = "text-embedding-ada-002"  # Used by the openai provider
+    EMBEDDING_DIMENSION: int = 384  # Used by the hashing provider
+
+    # Embedding batching settings
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_MAX_CONCURRENCY: int = 4  # Batches in flight at once
+    EMBEDDING_MAX_RETRIES: int = 5  # Retries per batch on throttling or transient errors
+    EMBEDDING_RETRY_BACKOFF_SECONDS: float = 1.0
+    EMBEDDING_RETRY_BACKOFF_MAX_SECONDS: float = 30.0
+
+    # Embedding cache settings
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "uploads/embedding_cache.sqlite3"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 1_000_000
+    
+    # Query log settings; queries are written to the database in batches
+    QUERY_LOG_MAX_BUFFER: int = 10000  # Queries buffered before new ones wait for the writer
+    QUERY_LOG_BATCH_SIZE: int = 500  # Rows per insert
+    QUERY_LOG_FLUSH_INTERVAL_SECONDS: float = 1.0
+    QUERY_LOG_MAX_RETRIES: int = 3  # A batch is dropped, and logged, after this many failed retries
+    
+    # Request tracing settings; traced responses get a Server-Timing header
+    TRACE_HEADER: str = "X-Trace"  # Send "1" to trace a request, "profile" to also profile it
+    TRACE_HEADER_ENABLED: bool = False  # Honour TRACE_HEADER; also needs a secret or a superuser token
+    TRACE_HEADER_SECRET: Optional[str] = None  # Shared secret a traced request sends in TRACE_SECRET_HEADER
+    TRACE_SECRET_HEADER: str = "X-Trace-Secret"
+    TRACE_SAMPLE_RATE: float = 0.0  # Share of all requests traced
+    TRACE_PROFILE_SAMPLE_RATE: float = 0.0  # Share of sampled requests that are also profiled
+    TRACE_PROFILE_TOP_N: int = 25  # Functions listed in a profile summary
+    TRACE_EXPORT_PATH: Optional[str] = None  # JSON Lines file that traces are appended to
+    
+    # Query history settings; the query table is partitioned by month
+    QUERY_PARTITION_MONTHS_AHEAD: int = 2  # Partitions created ahead of time
+    QUERY_RETENTION_MONTHS: int = 12  # Full months of queries kept besides the current one
+    QUERY_ROLLUP_LOOKBACK_DAYS: int = 2  # Days of daily rollups recomputed on each run
+    QUERY_MAINTENANCE_INTERVAL_SECONDS: float = 3600.0
     
     # Vector DB settings
-    VECTOR_DB_TYPE: str = "chroma"  # Options: chroma, pinecone, etc.
+    VECTOR_DB_TYPE: str = "chroma"  # Options: chroma, faiss, numpy
     VECTOR_DB_URL: Optional[str] = None
     VECTOR_DB_PERSIST_DIR: str = "uploads/chroma_db"
+    
+    # FAISS settings (VECTOR_DB_TYPE=faiss)
+    FAISS_INDEX_TYPE: str = "flat"  # Options: flat, ivf, hnsw
+    FAISS_IVF_NLIST: int = 1024  # Upper bound; fewer lists are used for small corpora
+    FAISS_IVF_NPROBE: int = 16
+    FAISS_IVF_MIN_TRAIN_SIZE: int = 10_000  # IVF stays exact (flat) below this many vectors
+    FAISS_HNSW_M: int = 32
+    FAISS_HNSW_EF_CONSTRUCTION: int = 80
+    FAISS_HNSW_EF_SEARCH: int = 64
+    FAISS_HNSW_REBUILD_FRACTION: float = 0.2  # Rebuild once this share of HNSW vectors is deleted
+    FAISS_EXACT_SEARCH_THRESHOLD: int = 20_000  # Score single-document searches exactly up to this size
+    
+    # Keyword (BM25) and hybrid search settings
+    KEYWORD_INDEX_DIR: str = "uploads/keyword_index"
+    KEYWORD_INDEX_CACHE_SIZE: int = 256  # Documents whose index is kept in memory
+    BM25_K1: float = 1.2
+    BM25_B: float = 0.75
+    HYBRID_VECTOR_WEIGHT: float = 0.5  # Weight of the vector score; BM25 gets the rest
+    HYBRID_CANDIDATES: int = 20  # Candidates taken from each retriever before fusion
+    
+    # Query response cache settings
+    QUERY_CACHE_ENABLED: bool = True
+    QUERY_CACHE_MAX_ENTRIES: int = 10000
+    QUERY_CACHE_TTL_SECONDS: int = 3600
+    QUERY_CACHE_SEMANTIC_ENABLED: bool = False  # Also reuse responses of similar (not identical) queries
+    QUERY_CACHE_SIMILARITY_THRESHOLD: float = 0.95  # Minimum cosine similarity for a semantic hit
 
     class Config:
         case_sensitive = True
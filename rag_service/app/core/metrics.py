@@ -0,0 +1,82 @@
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator
+
+from prometheus_client import REGISTRY, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from app.core.tracing import span
+
+OUTBOUND_REQUEST_DURATION = Histogram(
+    "outbound_request_duration_seconds",
+    "Time spent on calls to other services, by target and operation.",
+    ["target", "operation"],
+)
+RAG_STAGE_DURATION = Histogram(
+    "rag_stage_duration_seconds",
+    "Time spent in each stage of ingestion and query answering.",
+    ["stage"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0),
+)
+
+
+@contextmanager
+def outbound_timer(target: str, operation: str) -> Iterator[None]:
+    """Time one call to another service, also as a span if the request is traced."""
+    with span(f"{target}.{operation}"), OUTBOUND_REQUEST_DURATION.labels(target, operation).time():
+        yield
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """Time one pass through a RAG stage, also as a span if the request is traced."""
+    with span(stage), RAG_STAGE_DURATION.labels(stage).time():
+        yield
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """Record time spent in a RAG stage that was measured by the caller."""
+    RAG_STAGE_DURATION.labels(stage).observe(seconds)
+
+
+class CacheCollector:
+    """
+    Report in-process caches' hit and miss counts and size, read at scrape time.
+
+    Each cache is registered with its ``stats()`` method, whose result must
+    have ``hits``, ``misses`` and ``size`` keys.
+    """
+
+    def __init__(self):
+        self._caches: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def register(self, name: str, stats: Callable[[], Dict[str, Any]]) -> None:
+        self._caches[name] = stats
+
+    def collect(self) -> Iterator[Any]:
+        hits = CounterMetricFamily("cache_hits", "Lookups answered from the cache.", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Lookups the cache could not answer.", labels=["cache"])
+        hit_ratio = GaugeMetricFamily(
+            "cache_hit_ratio", "Share of lookups answered from the cache since startup.", labels=["cache"]
+        )
+        entries = GaugeMetricFamily("cache_entries", "Entries currently in the cache.", labels=["cache"])
+        for name, read in self._caches.items():
+            stats = read()
+            lookups = stats["hits"] + stats["misses"]
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            hit_ratio.add_metric([name], stats["hits"] / lookups if lookups else 0.0)
+            entries.add_metric([name], stats["size"])
+        yield hits
+        yield misses
+        yield hit_ratio
+        yield entries
+
+
+# Create a global instance
+cache_collector = CacheCollector()
+REGISTRY.register(cache_collector)
+
+
+def register_cache(name: str, stats: Callable[[], Dict[str, Any]]) -> None:
+    """Report a cache's hit and miss counters on ``/metrics``."""
+    cache_collector.register(name, stats)
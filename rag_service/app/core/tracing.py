@@ -0,0 +1,262 @@
+import cProfile
+import hmac
+import io
+import itertools
+import json
+import logging
+import pstats
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+from jose import JWTError
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.auth.jwt_verifier import local_token_verifier
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[int]] = ContextVar("current_span", default=None)
+
+# cProfile can't run twice at once (on Python 3.12 not even on different
+# threads), so only one traced call is profiled at a time
+_profile_lock = threading.Lock()
+
+
+class Trace:
+    """Spans recorded while serving one request, and its profile if it is sampled for one."""
+
+    def __init__(self, profile: bool = False):
+        self.id = uuid.uuid4().hex
+        self.start = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self._span_ids = itertools.count()
+        self.profile = profile
+        self.profile_stats: Optional[pstats.Stats] = None
+
+    def next_span_id(self) -> int:
+        return next(self._span_ids)
+
+    def add_span(self, span_id: int, name: str, parent: Optional[int], start: float, end: float) -> None:
+        # list.append is atomic, so spans can be added from worker threads
+        self.spans.append({
+            "id": span_id,
+            "parent": parent,
+            "name": name,
+            "start_ms": round((start - self.start) * 1000, 3),
+            "duration_ms": round((end - start) * 1000, 3),
+        })
+
+    def add_profile(self, profile: cProfile.Profile) -> None:
+        if self.profile_stats is None:
+            self.profile_stats = pstats.Stats(profile)
+        else:
+            self.profile_stats.add(profile)
+
+    def server_timing(self, total_ms: float) -> str:
+        """
+        The spans as a ``Server-Timing`` header value.
+
+        Spans with the same name, such as one per embedding batch, are added up.
+        """
+        durations: Dict[str, float] = {}
+        for span in self.spans:
+            durations[span["name"]] = durations.get(span["name"], 0.0) + span["duration_ms"]
+        entries = [f"{name};dur={duration:.3f}" for name, duration in durations.items()]
+        entries.append(f"total;dur={total_ms:.3f}")
+        return ", ".join(entries)
+
+    def profile_summary(self) -> Optional[str]:
+        if self.profile_stats is None:
+            return None
+        stream = io.StringIO()
+        self.profile_stats.stream = stream
+        self.profile_stats.sort_stats("cumulative").print_stats(settings.TRACE_PROFILE_TOP_N)
+        return stream.getvalue()
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """
+    Record the time spent in a block as a span of the current request's trace.
+
+    Does nothing unless the request is being traced. Context variables are
+    copied into worker threads, so spans work there as well.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    parent = _current_span.get()
+    span_id = trace.next_span_id()
+    token = _current_span.set(span_id)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        _current_span.reset(token)
+        trace.add_span(span_id, name, parent, start, end)
+
+
+def _call_profiled(trace: Trace, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    if not _profile_lock.acquire(blocking=False):
+        return func(*args, **kwargs)
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+            trace.add_profile(profile)
+    finally:
+        _profile_lock.release()
+
+
+async def run_traced(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run blocking work in a worker thread, profiling it if the request is sampled for profiling.
+
+    Embedding, search and response generation run this way, so the profile
+    covers the CPU-bound part of a request.
+    """
+    trace = _current_trace.get()
+    if trace is None or not trace.profile:
+        return await run_in_threadpool(func, *args, **kwargs)
+    return await run_in_threadpool(_call_profiled, trace, func, *args, **kwargs)
+
+
+class TraceExporter:
+    """Append finished traces to a JSON Lines file, one trace per line."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+class TracingMiddleware:
+    """
+    Pure ASGI middleware tracing requests that are sampled or opt in.
+
+    By default only TRACE_SAMPLE_RATE of requests are traced, and
+    TRACE_PROFILE_SAMPLE_RATE of those are profiled too. With
+    TRACE_HEADER_ENABLED, a request can also ask to be traced with the
+    TRACE_HEADER header (``1``, or ``profile`` to also profile it), but only
+    if it sends TRACE_HEADER_SECRET in TRACE_SECRET_HEADER or, when tokens
+    are verified locally, a bearer token of an active superuser; anyone else
+    could otherwise make the service run cProfile and read its timings. A
+    traced response carries a ``Server-Timing`` header with its spans and an
+    ``X-Trace-Id`` header. With TRACE_EXPORT_PATH set, the spans and
+    profile summary are appended there; otherwise the profile summary is
+    logged. Untraced requests only pay for a header lookup.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.header = settings.TRACE_HEADER.lower().encode("latin-1")
+        self.secret_header = settings.TRACE_SECRET_HEADER.lower().encode("latin-1")
+        if settings.TRACE_HEADER_ENABLED and not settings.TRACE_HEADER_SECRET and not local_token_verifier.enabled:
+            logger.warning("TRACE_HEADER_ENABLED is set but no request can use it without TRACE_HEADER_SECRET")
+
+    def _authorized(self, headers: Dict[bytes, bytes]) -> bool:
+        """Whether a request may ask to be traced: it knows the secret or comes from a superuser."""
+        secret = settings.TRACE_HEADER_SECRET
+        sent = headers.get(self.secret_header)
+        if secret and sent is not None and hmac.compare_digest(sent, secret.encode("latin-1")):
+            return True
+        # Superusers can only be recognised before the request is served
+        # when their token is verified in-process
+        if not local_token_verifier.enabled:
+            return False
+        scheme, _, token = headers.get(b"authorization", b"").decode("latin-1").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return False
+        try:
+            user = local_token_verifier.verify(token)
+        except JWTError:
+            return False
+        return bool(user and user["is_active"] and user["is_superuser"])
+
+    def _sample(self, scope: Scope) -> Optional[Trace]:
+        if settings.TRACE_HEADER_ENABLED:
+            headers = dict(scope["headers"])
+            value = headers.get(self.header, b"").decode("latin-1").strip().lower()
+            if value in ("profile", "1", "true") and self._authorized(headers):
+                return Trace(profile=value == "profile")
+        if settings.TRACE_SAMPLE_RATE and random.random() < settings.TRACE_SAMPLE_RATE:
+            return Trace(profile=random.random() < settings.TRACE_PROFILE_SAMPLE_RATE)
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trace = self._sample(scope)
+        if trace is None:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                total_ms = (time.perf_counter() - trace.start) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing(total_ms).encode("latin-1")))
+                headers.append((b"x-trace-id", trace.id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _current_trace.set(trace)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_trace.reset(token)
+            await self._finish(trace, scope, status_code)
+
+    async def _finish(self, trace: Trace, scope: Scope, status_code: int) -> None:
+        summary = trace.profile_summary()
+        if not trace_exporter.enabled:
+            if summary is not None:
+                logger.info("Profile of %s %s (trace %s):\n%s", scope["method"], scope["path"], trace.id, summary)
+            return
+        record = {
+            "trace_id": trace.id,
+            "timestamp": time.time(),
+            "method": scope["method"],
+            "path": scope["path"],
+            "status": status_code,
+            "duration_ms": round((time.perf_counter() - trace.start) * 1000, 3),
+            "spans": trace.spans,
+            "profile": summary,
+        }
+        try:
+            await run_in_threadpool(trace_exporter.write, record)
+        except OSError:
+            logger.exception("Failed to export trace %s", trace.id)
+
+
+# Create a global instance
+trace_exporter = TraceExporter(settings.TRACE_EXPORT_PATH)
@@ -1,15 +1,54 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 
+from shared.metrics import MetricsMiddleware, metrics_endpoint, register_pool
+
 from app.api.api_v1.api import api_router
+from app.core.auth.client import user_service_client
+from app.core.auth.jwt_verifier import local_token_verifier
+from app.core.auth.token_cache import token_cache
 from app.core.config import settings
+from app.core.metrics import register_cache
+from app.core.tracing import TracingMiddleware
+from app.db.session import async_engine, engine
+from app.rag.document_processor import document_processor
+from app.rag.embedding_cache import embedding_cache
+from app.rag.extractors import shutdown_extraction_pool
+from app.rag.ingestion import ingestion_queue
+from app.rag.query_history import query_history_maintenance
+from app.rag.query_log import query_log
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open shared clients and start background workers on startup,
+    # and stop them again on shutdown
+    await user_service_client.startup()
+    await local_token_verifier.load_keys()
+    await ingestion_queue.start()
+    await query_history_maintenance.start()
+    await query_log.start()
+    try:
+        yield
+    finally:
+        await query_log.stop()
+        await query_history_maintenance.stop()
+        await ingestion_queue.stop()
+        shutdown_extraction_pool()
+        document_processor.shutdown()
+        await user_service_client.shutdown()
+        await async_engine.dispose()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description="RAG Service for Document Processing and Querying",
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     docs_url="/docs",
+    lifespan=lifespan,
 )
 
 # Set up CORS
@@ -21,7 +60,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Break down the time spent on requests that opt in to tracing or are sampled
+app.add_middleware(TracingMiddleware)
+
+# Record the latency of every request, including those rejected by CORS
+app.add_middleware(MetricsMiddleware)
+register_pool("sync", engine.pool)
+register_pool("async", async_engine.sync_engine.pool)
+register_cache("token", token_cache.stats)
+if settings.EMBEDDING_CACHE_ENABLED:
+    register_cache("embedding", embedding_cache.stats)
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
+app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
 
 @app.get("/")
 async def root():
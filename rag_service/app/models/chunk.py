@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
 
 from app.db.base_class import Base
 
@@ -7,8 +8,11 @@ from app.db.base_class import Base
 class Chunk(Base):
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text)
+    content_hash = Column(String(64))  # SHA-256 of content, used to find unchanged chunks on reprocessing
+    chunk_index = Column(Integer)  # Position of the chunk within its document
     embedding_id = Column(String, index=True)
-    document_id = Column(Integer, ForeignKey("document.id"))
+    document_id = Column(Integer, ForeignKey("document.id"), index=True)
+    created_at = Column(DateTime, default=func.now())
     
     # Relationship with document
     document = relationship("Document", back_populates="chunks") 
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Text, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -6,15 +6,32 @@ from app.db.base_class import Base
 
 
 class Document(Base):
+    __table_args__ = (
+        # Keyset pagination of a user's documents, newest first
+        Index("ix_document_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
+    
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
     content = Column(Text)
     file_path = Column(String)
     file_type = Column(String)
+    content_hash = Column(String(64), index=True)  # SHA-256 of the uploaded file
+    file_size = Column(BigInteger)  # Size of the uploaded file in bytes
+    # Set when this document reuses the chunks and vectors of an identical, already-processed document
+    source_document_id = Column(Integer, ForeignKey("document.id", ondelete="SET NULL"), index=True)
     embedding_status = Column(Boolean, default=False)
     user_id = Column(Integer, index=True)  # Store the user ID from the user service
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
+    @property
+    def index_document_id(self) -> int:
+        """ID under which this document's chunks and vectors are stored."""
+        return self.source_document_id or self.id
+    
     # Relationship with chunks
-    chunks = relationship("Chunk", back_populates="document", cascade="all, delete-orphan") 
\ No newline at end of file
+    chunks = relationship("Chunk", back_populates="document", cascade="all, delete-orphan")
+
+    # Relationship with ingestion jobs
+    ingestion_jobs = relationship("IngestionJob", back_populates="document", cascade="all, delete-orphan") 
\ No newline at end of file
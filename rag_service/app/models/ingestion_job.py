@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, JSON
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+
+from app.db.base_class import Base
+
+
+class IngestionJob(Base):
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("document.id", ondelete="CASCADE"), index=True)
+    user_id = Column(Integer, index=True)
+    status = Column(String, index=True, default="queued")  # queued, running, completed, failed
+    stage = Column(String, default="queued")  # Current pipeline stage
+    chunks_total = Column(Integer, default=0)
+    chunks_processed = Column(Integer, default=0)
+    timings = Column(JSON, default=dict)  # Stage name -> elapsed milliseconds
+    error = Column(Text)
+    attempts = Column(Integer, default=0)
+    lease_expires_at = Column(DateTime)  # A running job whose lease lapsed is picked up again
+    created_at = Column(DateTime, default=func.now())
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+    # Relationship with document
+    document = relationship("Document", back_populates="ingestion_jobs")
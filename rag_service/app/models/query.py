@@ -1 +1,30 @@
- 
\ No newline at end of file
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Text, Float, Sequence, Index
+from sqlalchemy.sql import func
+
+from app.db.base_class import Base
+
+# Query IDs are handed out by the service before the row is written, from
+# blocks of this many values reserved with a single nextval()
+QUERY_ID_BLOCK_SIZE = 1000
+query_id_sequence = Sequence("query_id_seq", start=1, increment=QUERY_ID_BLOCK_SIZE)
+
+
+class Query(Base):
+    # Range-partitioned by month on PostgreSQL; app.rag.query_history creates
+    # and drops the partitions. The partition key must be part of the primary key.
+    __table_args__ = (
+        Index("ix_query_user_id_created_at", "user_id", "created_at"),
+        Index("ix_query_document_id_created_at", "document_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+    
+    id = Column(BigInteger, query_id_sequence, primary_key=True)
+    query_text = Column(Text, nullable=False)
+    response = Column(Text)
+    search_mode = Column(String(16))
+    latency_ms = Column(Float)  # Time taken to answer the query
+    user_id = Column(Integer)  # Store the user ID from the user service
+    # Not a foreign key: rows are written in batches some time after the
+    # query, when the document may already be gone
+    document_id = Column(Integer)
+    created_at = Column(DateTime, primary_key=True, nullable=False, default=func.now())
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, Date, Float
+
+from app.db.base_class import Base
+
+
+class QueryDailyRollup(Base):
+    # Per-user query counts and latency for one day, kept after the day's
+    # query partition is dropped
+    day = Column(Date, primary_key=True)
+    user_id = Column(Integer, primary_key=True)
+    query_count = Column(Integer, nullable=False, default=0)
+    latency_ms_avg = Column(Float)
+    latency_ms_p95 = Column(Float)
+    latency_ms_max = Column(Float)
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime
+from sqlalchemy.sql import func
+
+from app.db.base_class import Base
+
+
+class StoredFile(Base):
+    # Uploaded bytes are stored once per content hash and shared by every
+    # Document with that hash; ref_count tracks how many Documents point here.
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), unique=True, index=True, nullable=False)
+    file_path = Column(String, nullable=False)
+    file_size = Column(BigInteger)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=func.now())
@@ -0,0 +1,140 @@
+import hashlib
+from collections import defaultdict, deque
+from typing import Deque, Dict, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import bindparam, delete, insert, update
+from sqlalchemy.orm import Session
+
+from app.models.chunk import Chunk
+
+
+class StoredChunk(NamedTuple):
+    id: int
+    content_hash: Optional[str]
+    chunk_index: Optional[int]
+    embedding_id: Optional[str]
+
+
+class NewChunk(NamedTuple):
+    chunk_index: int
+    content: str
+    content_hash: str
+    embedding_id: str
+
+
+class ChunkDiff(NamedTuple):
+    added: List[NewChunk]  # Chunks to embed and insert
+    moved: List[Tuple[StoredChunk, int]]  # Kept chunks whose position changed, with the new position
+    embedding_ids: List[str]  # Embedding ID of every chunk, in document order
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_stored_chunks(db: Session, document_id: int) -> List[StoredChunk]:
+    """Load what diffing needs of a document's chunks, without their content."""
+    rows = db.query(Chunk.id, Chunk.content_hash, Chunk.chunk_index, Chunk.embedding_id).filter(
+        Chunk.document_id == document_id
+    )
+    return [StoredChunk(*row) for row in rows]
+
+
+class ChunkDiffer:
+    """
+    Match a document's new chunk texts against its stored chunks by content hash.
+
+    New chunks are fed in document order, in batches of any size, so a
+    document can be diffed while it is still being chunked. A stored chunk
+    is kept if a new chunk has the same content, wherever it moved to;
+    repeated texts are matched in order. Only unmatched new chunks need
+    embedding, and the stored chunks left unmatched at the end are removed.
+    Chunks stored before content hashes existed never match, so they are
+    replaced once.
+
+    Embedding IDs are derived from the content hash, with a suffix when the
+    same text occurs more than once, so a chunk keeps its vector when text
+    is inserted or removed before it.
+    """
+
+    def __init__(self, existing: Sequence[StoredChunk], document_id: int):
+        self.document_id = document_id
+        self.chunk_count = 0
+        self._available: Dict[str, Deque[StoredChunk]] = defaultdict(deque)
+        self._unmatched: Dict[int, StoredChunk] = {chunk.id: chunk for chunk in existing}
+        for chunk in sorted(existing, key=lambda c: (c.chunk_index is None, c.chunk_index or 0, c.id)):
+            if chunk.content_hash:
+                self._available[chunk.content_hash].append(chunk)
+        # Removed chunks' vectors are deleted after the new ones are written, so never reuse their IDs
+        self._used_embedding_ids: Set[str] = {chunk.embedding_id for chunk in existing}
+
+    def feed(self, texts: Sequence[str]) -> ChunkDiff:
+        """Diff the next chunks of the document; chunks to remove are only known at ``finish``."""
+        added: List[NewChunk] = []
+        moved: List[Tuple[StoredChunk, int]] = []
+        embedding_ids: List[str] = []
+        for text in texts:
+            index = self.chunk_count
+            self.chunk_count += 1
+            digest = chunk_hash(text)
+
+            candidates = self._available.get(digest)
+            if candidates:
+                chunk = candidates.popleft()
+                del self._unmatched[chunk.id]
+                if chunk.chunk_index != index:
+                    moved.append((chunk, index))
+                embedding_ids.append(chunk.embedding_id)
+                continue
+
+            base = f"doc_{self.document_id}_{digest[:32]}"
+            embedding_id, occurrence = base, 1
+            while embedding_id in self._used_embedding_ids:
+                embedding_id = f"{base}_{occurrence}"
+                occurrence += 1
+            self._used_embedding_ids.add(embedding_id)
+            added.append(NewChunk(index, text, digest, embedding_id))
+            embedding_ids.append(embedding_id)
+
+        return ChunkDiff(added, moved, embedding_ids)
+
+    def finish(self) -> List[StoredChunk]:
+        """Stored chunks that no new chunk matched, to be removed."""
+        return list(self._unmatched.values())
+
+
+def _batches(items: Sequence, size: int) -> Iterator[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def insert_chunks(db: Session, document_id: int, chunks: Sequence[NewChunk], batch_size: int) -> None:
+    """Insert new chunks with executemany, ``batch_size`` rows per statement."""
+    table = Chunk.__table__
+    for batch in _batches(chunks, batch_size):
+        db.execute(insert(table), [
+            {
+                "content": chunk.content,
+                "content_hash": chunk.content_hash,
+                "chunk_index": chunk.chunk_index,
+                "document_id": document_id,
+                "embedding_id": chunk.embedding_id,
+            }
+            for chunk in batch
+        ])
+
+
+def renumber_chunks(db: Session, moved: Sequence[Tuple[StoredChunk, int]], batch_size: int) -> None:
+    """Update the position of kept chunks with executemany."""
+    table = Chunk.__table__
+    statement = update(table).where(table.c.id == bindparam("chunk_id")).values(chunk_index=bindparam("new_index"))
+    for batch in _batches(moved, batch_size):
+        db.execute(statement, [{"chunk_id": chunk.id, "new_index": index} for chunk, index in batch])
+
+
+def delete_chunks(db: Session, chunks: Sequence[StoredChunk], batch_size: int) -> None:
+    """Delete chunks by ID, ``batch_size`` at a time."""
+    table = Chunk.__table__
+    for batch in _batches(chunks, batch_size):
+        db.execute(delete(table).where(table.c.id.in_([chunk.id for chunk in batch])))
+
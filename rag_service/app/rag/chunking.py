@@ -0,0 +1,236 @@
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import tiktoken
+
+# Boundary levels, from most to least preferred place to end a chunk
+PARAGRAPH, SENTENCE, WORD, ANY = 3, 2, 1, 0
+# Not a character boundary: cutting here would split a UTF-8 sequence
+_INVALID = -1
+
+# Tokens kept back at the end of a streamed block, since they may be
+# tokenized differently once the following text arrives
+_LOOKAHEAD_TOKENS = 8
+
+_WHITESPACE = np.zeros(256, dtype=bool)
+_WHITESPACE[list(b" \t\r\n\f\v")] = True
+_SENTENCE_END = np.zeros(256, dtype=bool)
+_SENTENCE_END[list(b".!?")] = True
+_NEWLINE = ord("\n")
+
+# Texts are tokenized in one piece per thread, but no smaller than this
+# many characters. Pieces start after a line break, where the tokenizer
+# starts a new token anyway, so the tokens are the same as in one pass.
+_MIN_ENCODE_PIECE_CHARS = 64 * 1024
+_PIECE_BREAK = re.compile(r"\n+(?=\S)")
+
+
+def token_byte_lengths(encoding: tiktoken.Encoding) -> np.ndarray:
+    """UTF-8 byte length of every token in the encoding's vocabulary, indexed by token."""
+    lengths = np.zeros(encoding.max_token_value + 1, dtype=np.int64)
+    for token in range(len(lengths)):
+        try:
+            lengths[token] = len(encoding.decode_single_token_bytes(token))
+        except KeyError:
+            # Gaps in the vocabulary
+            pass
+    return lengths
+
+
+def available_cpus() -> int:
+    """CPUs this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def boundary_levels(data: bytes, offsets: np.ndarray) -> np.ndarray:
+    """
+    Classify each place a chunk could end, between two tokens.
+
+    ``offsets[k]`` is the byte offset at which token ``k`` starts; the level
+    of ``offsets[k]`` for every ``0 < k < n`` is returned, one per token
+    after the first, with PARAGRAPH, SENTENCE, WORD, ANY or ``_INVALID``.
+    """
+    text = np.frombuffer(data, dtype=np.uint8)
+    cuts = offsets[1:-1]
+    levels = np.full(len(cuts), ANY, dtype=np.int8)
+    if not len(cuts):
+        return levels
+
+    prev = text[cuts - 1]
+    nxt = text[cuts]
+    prev2 = text[np.maximum(cuts - 2, 0)]
+    nxt2 = text[np.minimum(cuts + 1, len(text) - 1)]
+
+    levels[_WHITESPACE[prev] | _WHITESPACE[nxt]] = WORD
+    levels[(_SENTENCE_END[prev] & _WHITESPACE[nxt]) | (prev == _NEWLINE) | (nxt == _NEWLINE)] = SENTENCE
+    levels[((prev == _NEWLINE) & (prev2 == _NEWLINE)) | ((nxt == _NEWLINE) & (nxt2 == _NEWLINE))] = PARAGRAPH
+    levels[(nxt & 0xC0) == 0x80] = _INVALID
+    return levels
+
+
+class TokenChunker:
+    """
+    Split text into chunks of about ``chunk_tokens`` tokens.
+
+    Each block of text is tokenized once. The byte offset of every token is
+    found with a cumulative sum over a per-token length table, and every
+    place a chunk could end is classified at once with array operations, as
+    a paragraph break, sentence end, word break or anything else. A chunk
+    then ends at the best boundary between ``min_tokens`` and
+    ``chunk_tokens``, found by binary search over the sorted boundary
+    positions, preferring paragraphs to sentences to words. With no word
+    break in that window it extends to the next word break, but never past
+    ``max_tokens``.
+
+    Consecutive chunks share about ``overlap_tokens`` tokens, starting the
+    next chunk at a word break.
+
+    Tokenization dominates the cost. Each block is cut into one piece per
+    thread and the pieces are tokenized at the same time on
+    ``encode_threads`` threads (all available CPUs by default), since
+    tiktoken releases the GIL. Each piece is tokenized exactly once.
+    With one thread the text is tokenized in a single call, because handing
+    pieces between threads on one CPU only adds overhead.
+    """
+
+    def __init__(
+        self,
+        encoding_name: str,
+        chunk_tokens: int,
+        min_tokens: int,
+        overlap_tokens: int,
+        max_tokens: int,
+        encoding: Optional[tiktoken.Encoding] = None,
+        encode_threads: int = 0,
+    ):
+        if not 0 < min_tokens <= chunk_tokens <= max_tokens:
+            raise ValueError("Chunk sizes must satisfy 0 < min_tokens <= chunk_tokens <= max_tokens")
+        if not 0 <= overlap_tokens < min_tokens:
+            raise ValueError("overlap_tokens must be less than min_tokens")
+        self.encoding = encoding or tiktoken.get_encoding(encoding_name)
+        self.chunk_tokens = chunk_tokens
+        self.min_tokens = min_tokens
+        self.overlap_tokens = overlap_tokens
+        self.max_tokens = max_tokens
+        self._byte_lengths = token_byte_lengths(self.encoding)
+        self.encode_threads = encode_threads or available_cpus()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.encoding.encode_ordinary(text))
+
+    def _encode_piece(self, text: str) -> np.ndarray:
+        tokens = self.encoding.encode_ordinary(text)
+        return np.fromiter(tokens, dtype=np.int64, count=len(tokens))
+
+    def _encode(self, text: str) -> np.ndarray:
+        piece_chars = max(_MIN_ENCODE_PIECE_CHARS, len(text) // self.encode_threads + 1)
+        pieces = []
+        start = 0
+        while len(text) - start > piece_chars:
+            match = _PIECE_BREAK.search(text, start + piece_chars)
+            if match is None:
+                break
+            pieces.append(text[start:match.end()])
+            start = match.end()
+        pieces.append(text[start:])
+        if len(pieces) == 1:
+            return self._encode_piece(text)
+        return np.concatenate(list(self._encode_pool().map(self._encode_piece, pieces)))
+
+    def _encode_pool(self) -> ThreadPoolExecutor:
+        # Started on first use, since documents small enough to be one piece never need it
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.encode_threads, thread_name_prefix="chunk-encode")
+            return self._pool
+
+    def shutdown(self) -> None:
+        """Stop the tokenizing threads; they are started again if the chunker is used afterwards."""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+    def _find_end(self, start: int, n: int, positions: List[np.ndarray]) -> int:
+        """Token index at which the chunk starting at ``start`` ends."""
+        low, high = start + self.min_tokens, start + self.chunk_tokens
+        for level_positions in positions[:3]:
+            i = np.searchsorted(level_positions, high, side="right") - 1
+            if i >= 0 and level_positions[i] >= low:
+                return int(level_positions[i])
+
+        hard_limit = start + self.max_tokens
+        if hard_limit >= n:
+            return n
+        # No break within the budget: take the next word break, up to the hard limit
+        words = positions[2]
+        i = np.searchsorted(words, high, side="right")
+        if i < len(words) and words[i] <= hard_limit:
+            return int(words[i])
+        # Still none: cut at the last character boundary within the hard limit
+        valid = positions[3]
+        i = np.searchsorted(valid, hard_limit, side="right") - 1
+        if i >= 0 and valid[i] > start:
+            return int(valid[i])
+        return hard_limit
+
+    def _next_start(self, start: int, end: int, words: np.ndarray) -> int:
+        if not self.overlap_tokens:
+            return end
+        i = np.searchsorted(words, end - self.overlap_tokens, side="left")
+        if i < len(words) and start < words[i] < end:
+            return int(words[i])
+        return end
+
+    def _split(self, text: str, final: bool) -> Tuple[List[str], str]:
+        """Chunk ``text``; unless ``final``, return the unchunked tail to carry over."""
+        tokens = self._encode(text)
+        n = len(tokens)
+        data = text.encode("utf-8")
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(self._byte_lengths[tokens], out=offsets[1:])
+
+        levels = boundary_levels(data, offsets)
+        # Token indices at which a chunk may end, for each minimum level
+        cut_indices = np.arange(1, n, dtype=np.int64)
+        positions = [cut_indices[levels >= level] for level in (PARAGRAPH, SENTENCE, WORD, ANY)]
+
+        chunks: List[str] = []
+        start = 0
+        while start < n:
+            if not final and n - start <= self.max_tokens + _LOOKAHEAD_TOKENS:
+                return chunks, data[offsets[start]:].decode("utf-8")
+            end = n if n - start <= self.chunk_tokens else self._find_end(start, n, positions)
+            chunk = data[offsets[start]:offsets[end]].decode("utf-8").strip()
+            if chunk:
+                chunks.append(chunk)
+            if end >= n:
+                break
+            start = self._next_start(start, end, positions[2])
+        return chunks, ""
+
+    def iter_chunks(self, blocks: Iterable[str]) -> Iterator[str]:
+        """
+        Chunk streamed text, yielding each chunk as soon as it is complete.
+
+        Text that may still belong to an unfinished chunk is carried into the
+        next block, so at most one block plus one chunk is tokenized at a time.
+        """
+        carry = ""
+        for block in blocks:
+            chunks, carry = self._split(carry + block, final=False)
+            yield from chunks
+        chunks, _ = self._split(carry, final=True)
+        yield from chunks
+
+    def split_text(self, text: str) -> List[str]:
+        return list(self.iter_chunks([text]))
@@ -0,0 +1,56 @@
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.models.chunk import Chunk
+from app.models.document import Document
+
+
+def find_processed_duplicate(db: Session, document: Document) -> Optional[Document]:
+    """
+    Find an already-processed document with the same file contents.
+
+    Only canonical documents (those that own their chunks and vectors) are
+    considered, so links never chain.
+    """
+    if not document.content_hash:
+        return None
+    return db.query(Document).filter(
+        Document.content_hash == document.content_hash,
+        Document.id != document.id,
+        Document.source_document_id.is_(None),
+        Document.embedding_status == True,  # noqa: E712
+    ).order_by(Document.id).first()
+
+
+def promote_duplicate(db: Session, document: Document) -> Optional[Document]:
+    """
+    Hand a canonical document's chunks and vectors to one of its duplicates.
+
+    Called before the canonical document is deleted. The oldest duplicate
+    becomes the new canonical document and the remaining duplicates are
+    re-pointed at it. Returns the promoted document, or None if there were no
+    duplicates. The caller must commit ``db``.
+    """
+    dependents = db.query(Document).filter(
+        Document.source_document_id == document.id
+    ).order_by(Document.id).all()
+    if not dependents:
+        return None
+
+    from app.rag.embeddings import embedding_manager
+
+    promoted, others = dependents[0], dependents[1:]
+    db.query(Chunk).filter(Chunk.document_id == document.id).update(
+        {Chunk.document_id: promoted.id}, synchronize_session=False
+    )
+    promoted.source_document_id = None
+    db.add(promoted)
+    for other in others:
+        other.source_document_id = promoted.id
+        db.add(other)
+    # Expire so the deleted document's chunks collection no longer includes the moved rows
+    db.expire(document, ["chunks"])
+
+    embedding_manager.reassign_document_embeddings(document.id, promoted.id)
+    return promoted
@@ -1,9 +1,24 @@
+import hashlib
 import os
 import re
-from typing import List, Dict, Any
+from typing import Iterable, Iterator, List, Dict, Any, NamedTuple, Optional
 import uuid
 
 from app.core.config import settings
+from app.rag.chunking import TokenChunker
+from app.rag.extractors import get_extractor
+
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+
+
+class FileTooLargeError(ValueError):
+    """Raised when an upload exceeds MAX_CONTENT_LENGTH."""
+
+
+class SavedFile(NamedTuple):
+    path: str
+    content_hash: str  # SHA-256 hex digest of the file bytes
+    size: int
 
 
 class DocumentProcessor:
@@ -18,51 +33,150 @@ class DocumentProcessor:
     def __init__(self):
         # Create upload folder if it doesn't exist
         os.makedirs(settings.UPLOAD_FOLDER, exist_ok=True)
+        self.staging_folder = os.path.join(settings.UPLOAD_FOLDER, "staging")
+        os.makedirs(self.staging_folder, exist_ok=True)
+        self._token_chunker: Optional[TokenChunker] = None
     
-    def save_uploaded_file(self, file, user_id: int) -> str:
-        """Save the uploaded file to disk."""
+    def save_uploaded_file(self, file, user_id: int) -> SavedFile:
+        """
+        Stream the uploaded file to disk in fixed-size blocks.
+
+        The content hash and size are computed while writing, so memory use
+        does not depend on the file size. Raises FileTooLargeError, and removes
+        the partial file, once the upload passes MAX_CONTENT_LENGTH.
+
+        The file is written to a staging path; ``file_store.acquire`` moves it
+        to its content-addressed location.
+        """
         filename = f"{uuid.uuid4()}_{file.filename}"
-        file_path = os.path.join(settings.UPLOAD_FOLDER, filename)
+        file_path = os.path.join(self.staging_folder, filename)
         
-        with open(file_path, "wb") as f:
-            f.write(file.file.read())
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(file_path, "wb") as f:
+                while True:
+                    block = file.file.read(settings.UPLOAD_CHUNK_SIZE)
+                    if not block:
+                        break
+                    size += len(block)
+                    if size > settings.MAX_CONTENT_LENGTH:
+                        raise FileTooLargeError(
+                            f"File exceeds the maximum upload size of {settings.MAX_CONTENT_LENGTH} bytes"
+                        )
+                    digest.update(block)
+                    f.write(block)
+        except BaseException:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            raise
         
-        return file_path
+        return SavedFile(path=file_path, content_hash=digest.hexdigest(), size=size)
     
     def load_document(self, file_path: str, file_type: str) -> str:
         """Load and extract text from a document file."""
-        # In a real implementation, we would use specialized loaders like PyPDFLoader, etc.
-        # For simplicity, we'll just read the file as text
+        return "".join(self.iter_document_text(file_path, file_type))
+    
+    def iter_document_text(self, file_path: str, file_type: str) -> Iterator[str]:
+        """
+        Yield a document's text in blocks, using the extractor for its file type.
         
-        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-            text = f.read()
+        Text files are read STREAM_BLOCK_SIZE characters at a time and PDFs a
+        page at a time, so memory use does not grow with the file size.
+        """
+        yield from get_extractor(file_type or "txt")(file_path)
+    
+    def iter_text_blocks(self, text: str) -> Iterator[str]:
+        """Yield an in-memory text in the same blocks as ``iter_document_text``."""
+        for start in range(0, len(text), settings.STREAM_BLOCK_SIZE):
+            yield text[start:start + settings.STREAM_BLOCK_SIZE]
+    
+    def iter_paragraphs(self, blocks: Iterable[str]) -> Iterator[str]:
+        """
+        Split streamed text into paragraphs, carrying partial ones across blocks.
         
-        return text
+        A paragraph with no blank line for STREAM_BLOCK_SIZE characters, such
+        as a long log, is cut at its last line break so the carried-over text
+        stays bounded.
+        """
+        buffer = ""
+        for block in blocks:
+            buffer += block
+            # A separator touching the end of the buffer may continue in the next block
+            end = 0
+            for match in _PARAGRAPH_BREAK.finditer(buffer):
+                if match.end() == len(buffer):
+                    break
+                yield buffer[end:match.start()]
+                end = match.end()
+            buffer = buffer[end:]
+            
+            while len(buffer) > settings.STREAM_BLOCK_SIZE:
+                cut = buffer.rfind("\n", 0, settings.STREAM_BLOCK_SIZE)
+                if cut <= 0:
+                    cut = settings.STREAM_BLOCK_SIZE
+                yield buffer[:cut]
+                buffer = buffer[cut:]
+        yield buffer
     
-    def split_text_into_chunks(self, text: str) -> List[str]:
-        """Split the text into smaller chunks for processing."""
-        # Simple implementation: split by paragraphs
-        paragraphs = re.split(r'\n\s*\n', text)
+    def iter_chunks(self, blocks: Iterable[str]) -> Iterator[str]:
+        """
+        Split streamed text into chunks, yielding each as soon as it is complete.
         
-        # Filter out empty paragraphs and trim
-        chunks = [p.strip() for p in paragraphs if p.strip()]
+        CHUNKING_STRATEGY selects token-budgeted chunks (see ``TokenChunker``)
+        or groups of paragraphs under 1000 characters.
+        """
+        if settings.CHUNKING_STRATEGY == "token":
+            return self.token_chunker.iter_chunks(blocks)
+        if settings.CHUNKING_STRATEGY == "paragraph":
+            return self.iter_paragraph_chunks(blocks)
+        raise ValueError(
+            f"Unknown chunking strategy {settings.CHUNKING_STRATEGY!r}; expected 'token' or 'paragraph'"
+        )
+    
+    @property
+    def token_chunker(self) -> TokenChunker:
+        # Built on first use, since loading the encoding may download it
+        if self._token_chunker is None:
+            self._token_chunker = TokenChunker(
+                settings.CHUNK_ENCODING,
+                chunk_tokens=settings.CHUNK_SIZE_TOKENS,
+                min_tokens=settings.CHUNK_MIN_TOKENS,
+                overlap_tokens=settings.CHUNK_OVERLAP_TOKENS,
+                max_tokens=settings.CHUNK_MAX_TOKENS,
+                encode_threads=settings.CHUNK_ENCODE_THREADS
+            )
+        return self._token_chunker
+    
+    def shutdown(self) -> None:
+        """Stop the token chunker's tokenizing threads, if it was ever used."""
+        if self._token_chunker is not None:
+            self._token_chunker.shutdown()
+    
+    def iter_paragraph_chunks(self, blocks: Iterable[str]) -> Iterator[str]:
+        """Group paragraphs into chunks of under 1000 characters."""
+        # Simple implementation: split by paragraphs, skipping empty ones
+        paragraphs = (p.strip() for p in self.iter_paragraphs(blocks))
         
         # Combine short paragraphs
-        result = []
         current_chunk = ""
         
-        for chunk in chunks:
+        for chunk in paragraphs:
+            if not chunk:
+                continue
             if len(current_chunk) + len(chunk) < 1000:
                 current_chunk += "\n\n" + chunk if current_chunk else chunk
             else:
                 if current_chunk:
-                    result.append(current_chunk)
+                    yield current_chunk
                 current_chunk = chunk
         
         if current_chunk:
-            result.append(current_chunk)
-        
-        return result
+            yield current_chunk
+    
+    def split_text_into_chunks(self, text: str) -> List[str]:
+        """Split the text into smaller chunks for processing."""
+        return list(self.iter_chunks(self.iter_text_blocks(text)))
     
     def detect_file_type(self, filename: str) -> str:
         """Detect the file type from the filename."""
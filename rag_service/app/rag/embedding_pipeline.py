@@ -0,0 +1,143 @@
+import logging
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from langchain.embeddings.base import Embeddings
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying: throttling and transient upstream errors
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class EmbeddingBatch(NamedTuple):
+    ids: List[str]
+    texts: List[str]
+    metadatas: List[Dict[str, Any]]
+
+
+class BatchStats(NamedTuple):
+    index: int
+    size: int
+    latency_ms: float
+    attempts: int
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Whether an embedding error looks like throttling or a transient failure."""
+    status_code = getattr(exc, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(exc, "response", None), "status_code", None)
+    if status_code in RETRYABLE_STATUS_CODES:
+        return True
+    # openai raises these without a status code
+    return type(exc).__name__ in {"RateLimitError", "APITimeoutError", "APIConnectionError", "Timeout"}
+
+
+def make_batches(
+    ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]], batch_size: int
+) -> Iterator[EmbeddingBatch]:
+    """Split parallel lists into batches of at most ``batch_size`` items."""
+    for start in range(0, len(texts), batch_size):
+        end = start + batch_size
+        yield EmbeddingBatch(ids[start:end], texts[start:end], metadatas[start:end])
+
+
+class EmbeddingPipeline:
+    """
+    Embed batches concurrently with a bound on how many are in flight.
+
+    Batches are pulled from the input lazily: a new batch is only started
+    when fewer than ``max_in_flight`` are running, so a slow or throttled
+    embedding backend holds back the producer instead of letting work pile
+    up. Results are handed to ``write`` on the calling thread, one batch at a
+    time, in completion order.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_in_flight: int,
+        max_retries: int,
+        backoff_seconds: float,
+        backoff_max_seconds: float,
+    ):
+        self.embeddings = embeddings
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+
+    def _embed_with_retry(self, texts: List[str]) -> Tuple[List[List[float]], int]:
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return self.embeddings.embed_documents(texts), attempt
+            except Exception as e:
+                if attempt > self.max_retries or not is_retryable(e):
+                    raise
+                # Exponential backoff with full jitter
+                delay = random.uniform(
+                    0, min(self.backoff_max_seconds, self.backoff_seconds * 2 ** (attempt - 1))
+                )
+                logger.warning("Embedding batch throttled (attempt %s), retrying in %.2fs: %s", attempt, delay, e)
+                time.sleep(delay)
+
+    def _run_batch(self, index: int, batch: EmbeddingBatch) -> Tuple[EmbeddingBatch, List[List[float]], BatchStats]:
+        start = time.perf_counter()
+        vectors, attempts = self._embed_with_retry(batch.texts)
+        latency_ms = (time.perf_counter() - start) * 1000
+        return batch, vectors, BatchStats(index, len(batch.texts), latency_ms, attempts)
+
+    def run(
+        self,
+        batches: Iterable[EmbeddingBatch],
+        write: Callable[[EmbeddingBatch, List[List[float]]], None],
+        on_batch: Optional[Callable[[BatchStats], None]] = None,
+    ) -> List[BatchStats]:
+        """
+        Embed every batch and pass the vectors to ``write``.
+
+        If any batch fails for good, batches still running are waited for
+        (but not written) and the error is raised.
+        """
+        stats: List[BatchStats] = []
+        pending: Set[Future] = set()
+        batch_iter = enumerate(batches)
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            try:
+                exhausted = False
+                while True:
+                    # Top up to the in-flight limit
+                    while not exhausted and len(pending) < self.max_in_flight:
+                        try:
+                            index, batch = next(batch_iter)
+                        except StopIteration:
+                            exhausted = True
+                            break
+                        pending.add(executor.submit(self._run_batch, index, batch))
+
+                    if not pending:
+                        break
+
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        batch, vectors, batch_stats = future.result()
+                        write(batch, vectors)
+                        stats.append(batch_stats)
+                        logger.info(
+                            "Embedded batch %s (%s chunks) in %.1f ms after %s attempt(s)",
+                            batch_stats.index, batch_stats.size, batch_stats.latency_ms, batch_stats.attempts,
+                        )
+                        if on_batch is not None:
+                            on_batch(batch_stats)
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+
+        return stats
@@ -0,0 +1,139 @@
+import re
+import zlib
+from typing import Callable, Dict, List
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+from app.core.config import settings
+from app.core.metrics import outbound_timer
+
+
+class EmbeddingProvider(Embeddings):
+    """
+    Interface for embedding backends selectable through EMBEDDING_PROVIDER.
+
+    ``model_name`` identifies the model and its parameters. It is part of the
+    embedding cache key, so vectors from different models never mix.
+    """
+
+    model_name: str
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """Embeddings from the OpenAI API."""
+
+    def __init__(self, model: str, api_key: str):
+        from langchain_openai import OpenAIEmbeddings
+
+        self.model_name = model
+        self.client = OpenAIEmbeddings(model=model, openai_api_key=api_key)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with outbound_timer("openai", "embed_documents"):
+            return self.client.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with outbound_timer("openai", "embed_query"):
+            return self.client.embed_query(text)
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Local, CPU-only embeddings from hashed character n-grams and words.
+
+    Every feature is hashed to one of ``dimension`` buckets with a random
+    sign. This is a sparse random projection of the n-gram count vector.
+    Counts are log-scaled and the result is L2-normalized, so cosine
+    similarity approximates n-gram overlap. Character n-gram hashes are
+    computed for a whole text at once with a vectorized rolling hash over
+    its UTF-8 bytes. The output is deterministic across processes and
+    machines.
+    """
+
+    NGRAM_SIZES = (3, 4, 5)
+    _WORD_RE = re.compile(r"\w+")
+    _PRIME = np.uint64(1099511628211)  # FNV-64 prime
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+        self.model_name = f"hashing-ngram-v1-{dimension}"
+
+    @staticmethod
+    def _mix(h: np.ndarray) -> np.ndarray:
+        # splitmix64 finalizer, so nearby inputs land in unrelated buckets
+        h = h ^ (h >> np.uint64(30))
+        h = h * np.uint64(0xBF58476D1CE4E5B9)
+        h = h ^ (h >> np.uint64(27))
+        h = h * np.uint64(0x94D049BB133111EB)
+        return h ^ (h >> np.uint64(31))
+
+    def _feature_hashes(self, text: str) -> np.ndarray:
+        normalized = " ".join(text.lower().split())
+        data = np.frombuffer(f" {normalized} ".encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+
+        hashes = []
+        for n in self.NGRAM_SIZES:
+            count = len(data) - n + 1
+            if count <= 0:
+                continue
+            h = np.full(count, np.uint64(n), dtype=np.uint64)
+            for k in range(n):
+                h = h * self._PRIME + data[k:k + count]
+            hashes.append(h)
+
+        words = self._WORD_RE.findall(normalized)
+        if words:
+            # Offset word hashes so they never collide with n-gram hashes of the same bytes
+            hashes.append(
+                np.fromiter((zlib.crc32(w.encode("utf-8")) for w in words), dtype=np.uint64, count=len(words))
+                + np.uint64(1 << 40)
+            )
+
+        if not hashes:
+            return np.empty(0, dtype=np.uint64)
+        return self._mix(np.concatenate(hashes))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        dim = np.uint64(self.dimension)
+        indices, signs = [], []
+        for row, text in enumerate(texts):
+            h = self._feature_hashes(text)
+            indices.append((h % dim).astype(np.int64) + row * self.dimension)
+            signs.append(np.where(h >> np.uint64(63), -1.0, 1.0))
+
+        counts = np.bincount(
+            np.concatenate(indices),
+            weights=np.concatenate(signs),
+            minlength=len(texts) * self.dimension,
+        ).reshape(len(texts), self.dimension)
+
+        vectors = np.sign(counts) * np.log1p(np.abs(counts))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).astype(np.float32).tolist()
+
+
+EMBEDDING_PROVIDERS: Dict[str, Callable[[], EmbeddingProvider]] = {
+    "openai": lambda: OpenAIEmbeddingProvider(
+        model=settings.EMBEDDING_MODEL,
+        api_key=settings.OPENAI_API_KEY,
+    ),
+    "hashing": lambda: HashingEmbeddingProvider(dimension=settings.EMBEDDING_DIMENSION),
+}
+
+
+def get_embedding_provider(name: str) -> EmbeddingProvider:
+    """Build the embedding provider registered under ``name``."""
+    try:
+        factory = EMBEDDING_PROVIDERS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown embedding provider {name!r}; expected one of {sorted(EMBEDDING_PROVIDERS)}"
+        )
+    return factory()
@@ -1,63 +1,139 @@
-from typing import List, Dict, Any
-import os
-from langchain_openai import OpenAIEmbeddings
-from langchain.vectorstores import Chroma
-from langchain.docstore.document import Document as LangchainDocument
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from typing import List, Dict, Any, Callable, Iterable, Optional, Sequence
 
 from app.core.config import settings
+from app.core.metrics import observe_stage, stage_timer
+from app.rag.embedding_cache import CachedEmbeddings, embedding_cache
+from app.rag.embedding_pipeline import BatchStats, EmbeddingBatch, EmbeddingPipeline, make_batches
+from app.rag.embedding_providers import get_embedding_provider
+from app.rag.keyword_index import keyword_index_store
+from app.rag.vector_store import SearchResult, get_vector_store
 
 
 class EmbeddingManager:
-    """Manages document embeddings using Langchain with OpenAI embeddings"""
+    """Manages document embeddings with a configurable embedding provider and vector store"""
     
     def __init__(self):
-        """Initialize the embedding manager with OpenAI embeddings"""
-        self.embeddings = OpenAIEmbeddings(
-            model="text-embedding-ada-002",
-            openai_api_key=settings.OPENAI_API_KEY
-        )
+        """Initialize the embedding manager with the provider named by EMBEDDING_PROVIDER"""
+        self.provider = get_embedding_provider(settings.EMBEDDING_PROVIDER)
+        self.embeddings = self.provider
         
-        # Set up persistent DB path
-        self.persist_directory = os.path.join(settings.UPLOAD_FOLDER, "chroma_db")
-        os.makedirs(self.persist_directory, exist_ok=True)
+        # Serve chunks that were embedded before from the local cache
+        if settings.EMBEDDING_CACHE_ENABLED:
+            self.embeddings = CachedEmbeddings(
+                self.provider,
+                model_name=self.provider.model_name,
+                cache=embedding_cache
+            )
         
-        # Initialize vector store
-        self.vector_store = Chroma(
-            persist_directory=self.persist_directory,
-            embedding_function=self.embeddings
+        # Embed large documents in concurrent batches
+        self.pipeline = EmbeddingPipeline(
+            self.embeddings,
+            max_in_flight=settings.EMBEDDING_MAX_CONCURRENCY,
+            max_retries=settings.EMBEDDING_MAX_RETRIES,
+            backoff_seconds=settings.EMBEDDING_RETRY_BACKOFF_SECONDS,
+            backoff_max_seconds=settings.EMBEDDING_RETRY_BACKOFF_MAX_SECONDS
         )
+        
+        # Initialize the vector store selected by VECTOR_DB_TYPE
+        self.vector_store = get_vector_store()
     
-    def create_document_embeddings(self, chunks: List[str], document_id: int) -> List[str]:
+    def create_document_embeddings(
+        self,
+        chunks: List[str],
+        document_id: int,
+        on_batch: Optional[Callable[[BatchStats], None]] = None,
+        ids: Optional[List[str]] = None
+    ) -> List[str]:
         """
         Create embeddings for document chunks and store them in the vector store.
         
+        Chunks are embedded in batches of EMBEDDING_BATCH_SIZE with at most
+        EMBEDDING_MAX_CONCURRENCY batches in flight, and each batch is written
+        to the vector store as soon as it is embedded.
+        
         Args:
             chunks: List of text chunks from the document
             document_id: The ID of the document
+            on_batch: Optional callback receiving timing stats for each batch
+            ids: Optional embedding IDs, one per chunk; positional IDs are used if omitted
             
         Returns:
             List of embedding IDs for each chunk
         """
-        # Create Langchain documents with metadata
-        langchain_docs = [
-            LangchainDocument(
-                page_content=chunk,
-                metadata={"document_id": document_id, "chunk_index": i}
-            )
-            for i, chunk in enumerate(chunks)
-        ]
+        if ids is None:
+            ids = [f"doc_{document_id}_chunk_{i}" for i in range(len(chunks))]
+        # Positions are not stored with the vectors, since they shift whenever earlier text changes
+        metadatas = [{"document_id": document_id} for _ in chunks]
         
-        # Add documents to the vector store
-        ids = [f"doc_{document_id}_chunk_{i}" for i in range(len(chunks))]
-        self.vector_store.add_documents(langchain_docs, ids=ids)
+        self.create_embeddings(
+            make_batches(ids, chunks, metadatas, settings.EMBEDDING_BATCH_SIZE),
+            on_batch=on_batch
+        )
+        
+        return ids
+    
+    def create_embeddings(
+        self,
+        batches: Iterable[EmbeddingBatch],
+        on_written: Optional[Callable[[EmbeddingBatch], None]] = None,
+        on_batch: Optional[Callable[[BatchStats], None]] = None
+    ) -> None:
+        """
+        Embed batches pulled lazily from ``batches`` and store them in the vector store.
+        
+        ``batches`` may be a generator that produces chunks as a document is
+        read, so only the batches in flight are held in memory. Batches are
+        pulled and ``on_written`` is called on the calling thread, after each
+        batch's vectors are added. The vector store is persisted once at the
+        end.
+        """
+        def write(batch: EmbeddingBatch, vectors: List[List[float]]) -> None:
+            self.vector_store.add(batch.ids, vectors, batch.texts, batch.metadatas)
+            if on_written is not None:
+                on_written(batch)
+        
+        def record_batch(stats: BatchStats) -> None:
+            observe_stage("embedding", stats.latency_ms / 1000)
+            if on_batch is not None:
+                on_batch(stats)
+        
+        self.pipeline.run(batches, write, on_batch=record_batch)
         
         # Persist the vector store
         self.vector_store.persist()
-        
-        return ids
     
-    def search_similar_chunks(self, query: str, document_id: int = None, top_k: int = 3) -> List[Dict[str, Any]]:
+    def delete_embeddings(self, ids: List[str]) -> None:
+        """Remove individual vectors from the vector store."""
+        if not ids:
+            return
+        self.vector_store.delete(ids)
+        self.vector_store.persist()
+    
+    def delete_document_embeddings(self, document_id: int) -> None:
+        """Remove all of a document's vectors from the vector store, and its keyword index."""
+        self.vector_store.delete_document(document_id)
+        self.vector_store.persist()
+        keyword_index_store.delete(document_id)
+    
+    def reassign_document_embeddings(self, old_document_id: int, new_document_id: int) -> None:
+        """Move a document's vectors to another document ID without re-embedding them."""
+        self.vector_store.reassign_document(old_document_id, new_document_id)
+        self.vector_store.persist()
+        keyword_index_store.reassign(old_document_id, new_document_id)
+    
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a query, through the embedding cache if it is enabled."""
+        with stage_timer("embedding"):
+            return self.embeddings.embed_query(query)
+    
+    def search_similar_chunks(
+        self,
+        query: str,
+        document_id: int = None,
+        top_k: int = 3,
+        search_mode: str = "vector",
+        query_embedding: Optional[Sequence[float]] = None
+    ) -> List[Dict[str, Any]]:
         """
         Search for chunks similar to the query.
         
@@ -65,32 +141,99 @@ class EmbeddingManager:
             query: The query text
             document_id: Optional document ID to filter results
             top_k: Number of results to return
+            search_mode: "vector" (embedding similarity), "keyword" (BM25, no
+                embedding call) or "hybrid" (both, with scores fused)
+            query_embedding: The query's embedding, if already computed
             
         Returns:
             List of dictionaries containing chunk content and metadata
         """
-        # Default search
-        if document_id is None:
-            results = self.vector_store.similarity_search_with_score(query, k=top_k)
-        else:
-            # Filter by document ID
-            results = self.vector_store.similarity_search_with_score(
-                query, 
-                k=top_k,
-                filter={"document_id": document_id}
-            )
+        if search_mode == "keyword":
+            with stage_timer("keyword_search"):
+                return self._format_results(keyword_index_store.search(query, document_id=document_id, top_k=top_k))
+        
+        if query_embedding is None:
+            query_embedding = self.embed_query(query)
+        if search_mode == "vector":
+            return self.search_by_embedding(query_embedding, document_id=document_id, top_k=top_k)
+        if search_mode != "hybrid":
+            raise ValueError(f"Unknown search mode {search_mode!r}")
+        
+        candidates = max(top_k, settings.HYBRID_CANDIDATES)
+        with stage_timer("vector_search"):
+            vector_results = self.vector_store.search(query_embedding, candidates, document_id=document_id)
+        with stage_timer("keyword_search"):
+            keyword_results = keyword_index_store.search(query, document_id=document_id, top_k=candidates)
+        return self._format_results(
+            fuse_results(vector_results, keyword_results, settings.HYBRID_VECTOR_WEIGHT)[:top_k]
+        )
+    
+    def search_by_embedding(
+        self,
+        query_embedding: Sequence[float],
+        document_id: int = None,
+        top_k: int = 3
+    ) -> List[Dict[str, Any]]:
+        """
+        Search for chunks similar to an already embedded query.
         
-        # Format results
+        Scores are cosine similarities, higher meaning more similar.
+        """
+        with stage_timer("vector_search"):
+            results = self.vector_store.search(query_embedding, top_k, document_id=document_id)
+        return self._format_results(results)
+    
+    @staticmethod
+    def _format_results(results: List[SearchResult]) -> List[Dict[str, Any]]:
         formatted_results = []
-        for doc, score in results:
+        for result in results:
             formatted_results.append({
-                "content": doc.page_content,
-                "metadata": doc.metadata,
-                "score": score
+                "content": result.content,
+                "metadata": result.metadata,
+                "score": result.score
             })
         
         return formatted_results
 
 
+def _normalize_scores(results: List[SearchResult]) -> Dict[str, float]:
+    """Min-max scale scores to [0, 1] so different retrievers can be compared."""
+    if not results:
+        return {}
+    scores = [r.score for r in results]
+    low, high = min(scores), max(scores)
+    if high == low:
+        return {r.id: 1.0 for r in results}
+    return {r.id: (r.score - low) / (high - low) for r in results}
+
+
+def fuse_results(
+    vector_results: List[SearchResult],
+    keyword_results: List[SearchResult],
+    vector_weight: float
+) -> List[SearchResult]:
+    """
+    Combine vector and BM25 results into one ranking.
+    
+    Each list's scores are min-max normalized. A chunk's fused score is the
+    weighted sum of its normalized scores, counting 0 for a list it is
+    missing from.
+    """
+    vector_scores = _normalize_scores(vector_results)
+    keyword_scores = _normalize_scores(keyword_results)
+    by_id = {r.id: r for r in keyword_results}
+    by_id.update((r.id, r) for r in vector_results)
+    
+    fused = [
+        result._replace(score=(
+            vector_weight * vector_scores.get(id_, 0.0)
+            + (1 - vector_weight) * keyword_scores.get(id_, 0.0)
+        ))
+        for id_, result in by_id.items()
+    ]
+    fused.sort(key=lambda r: r.score, reverse=True)
+    return fused
+
+
 # Create a global instance
 embedding_manager = EmbeddingManager() 
\ No newline at end of file
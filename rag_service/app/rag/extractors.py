@@ -0,0 +1,186 @@
+import multiprocessing
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from html.parser import HTMLParser
+from typing import Callable, Deque, Dict, Iterator, List, Optional
+
+from app.core.config import settings
+
+# Page breaks are paragraph breaks for the chunker
+PAGE_SEPARATOR = "\n\n"
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _worker_count() -> int:
+    return settings.PDF_EXTRACTION_WORKERS or os.cpu_count() or 1
+
+
+def get_extraction_pool() -> ProcessPoolExecutor:
+    """Process pool shared by all PDF extractions, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned rather than forked, since ingestion runs on worker threads
+            _pool = ProcessPoolExecutor(
+                max_workers=_worker_count(),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def shutdown_extraction_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def extract_text_file(file_path: str) -> Iterator[str]:
+    """Read a text file in blocks of STREAM_BLOCK_SIZE characters."""
+    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+        while True:
+            block = f.read(settings.STREAM_BLOCK_SIZE)
+            if not block:
+                break
+            yield block
+
+
+def _extract_pdf_pages(file_path: str, start: int, end: int) -> List[str]:
+    """Extract pages ``start`` to ``end`` of a PDF; runs in a pool process."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(file_path)
+    return [reader.pages[number].extract_text() or "" for number in range(start, end)]
+
+
+def extract_pdf(file_path: str) -> Iterator[str]:
+    """
+    Yield a PDF's text one page at a time, in page order.
+
+    Documents with at least PDF_PARALLEL_MIN_PAGES pages are extracted on
+    the process pool, PDF_PAGES_PER_TASK pages per task. Only a few tasks
+    per worker are queued ahead of the consumer, so extracted pages don't
+    pile up while the chunker and embedder catch up.
+    """
+    from pypdf import PdfReader
+
+    page_count = len(PdfReader(file_path).pages)
+    if page_count < settings.PDF_PARALLEL_MIN_PAGES:
+        for page in _extract_pdf_pages(file_path, 0, page_count):
+            yield page + PAGE_SEPARATOR
+        return
+
+    pool = get_extraction_pool()
+    step = settings.PDF_PAGES_PER_TASK
+    max_pending = 2 * _worker_count()
+    ranges = iter(range(0, page_count, step))
+    pending: Deque[Future] = deque()
+    try:
+        while True:
+            while len(pending) < max_pending:
+                start = next(ranges, None)
+                if start is None:
+                    break
+                pending.append(
+                    pool.submit(_extract_pdf_pages, file_path, start, min(start + step, page_count))
+                )
+            if not pending:
+                break
+            for page in pending.popleft().result():
+                yield page + PAGE_SEPARATOR
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def extract_docx(file_path: str) -> Iterator[str]:
+    """Yield a Word document's text in blocks of STREAM_BLOCK_SIZE characters."""
+    import docx2txt
+
+    # docx2txt parses the whole document at once; uploads are bounded by MAX_CONTENT_LENGTH
+    text = docx2txt.process(file_path) or ""
+    for start in range(0, len(text), settings.STREAM_BLOCK_SIZE):
+        yield text[start:start + settings.STREAM_BLOCK_SIZE]
+
+
+class _HTMLTextParser(HTMLParser):
+    """Collect the visible text of an HTML document as it is fed."""
+
+    SKIPPED_TAGS = {"script", "style", "noscript", "template", "head", "svg"}
+    BLOCK_TAGS = {
+        "address", "article", "aside", "blockquote", "dd", "div", "dl", "dt", "figcaption",
+        "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr",
+        "li", "main", "nav", "ol", "p", "pre", "section", "table", "td", "th", "tr", "ul",
+    }
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skip_depth = 0
+        self._pre_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag == "br":
+            self.parts.append("\n")
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n\n")
+        if tag == "pre":
+            self._pre_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n\n")
+        if tag == "pre":
+            self._pre_depth = max(0, self._pre_depth - 1)
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        self.parts.append(data if self._pre_depth else re.sub(r"\s+", " ", data))
+
+    def take_text(self) -> str:
+        text = "".join(self.parts)
+        self.parts = []
+        return text
+
+
+def extract_html(file_path: str) -> Iterator[str]:
+    """Strip markup with a streaming parser, yielding text as each block of the file is parsed."""
+    parser = _HTMLTextParser()
+    for block in extract_text_file(file_path):
+        parser.feed(block)
+        text = parser.take_text()
+        if text:
+            yield text
+    parser.close()
+    text = parser.take_text()
+    if text:
+        yield text
+
+
+TEXT_EXTRACTORS: Dict[str, Callable[[str], Iterator[str]]] = {
+    "txt": extract_text_file,
+    "pdf": extract_pdf,
+    "docx": extract_docx,
+    "html": extract_html,
+}
+
+
+def get_extractor(file_type: str) -> Callable[[str], Iterator[str]]:
+    """Text extractor registered for a file type, as returned by ``detect_file_type``."""
+    try:
+        return TEXT_EXTRACTORS[file_type]
+    except KeyError:
+        raise ValueError(
+            f"Unknown file type {file_type!r}; expected one of {sorted(TEXT_EXTRACTORS)}"
+        )
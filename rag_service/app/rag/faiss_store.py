@@ -0,0 +1,300 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import List, Optional, Sequence
+
+import faiss
+import numpy as np
+
+from app.core.config import settings
+from app.rag.vector_store import SearchResult, VectorStore
+
+
+class FaissVectorStore(VectorStore):
+    """
+    Vector store backed by a FAISS inner-product index.
+
+    ``index_type`` selects the index: ``flat`` for exact search, ``ivf``
+    (inverted lists, trained on the data) or ``hnsw`` (graph). Chunk text
+    and metadata live in a SQLite sidecar that maps string IDs to FAISS
+    integer IDs.
+
+    On startup the index file is memory-mapped read-only. It is loaded
+    into memory the first time it is written to.
+
+    Document-scoped searches use an ID selector over the document's
+    vectors. If the document has at most ``FAISS_EXACT_SEARCH_THRESHOLD``
+    vectors, they are scored exactly against the query instead, which is
+    cheaper and never misses a match.
+
+    HNSW graphs cannot remove vectors. Deleted HNSW vectors are hidden with
+    a selector and dropped when the index is rebuilt, which happens once
+    they exceed ``FAISS_HNSW_REBUILD_FRACTION`` of the index.
+    """
+
+    INDEX_FILE = "faiss.index"
+    META_FILE = "faiss_meta.sqlite3"
+    # FAISS warns when an IVF index is trained on fewer than ~39 points per list
+    IVF_MIN_POINTS_PER_LIST = 39
+
+    def __init__(self, persist_directory: str, index_type: str = "flat"):
+        if index_type not in ("flat", "ivf", "hnsw"):
+            raise ValueError(f"Unsupported FAISS index type {index_type!r}")
+        self.index_type = index_type
+        self.persist_directory = persist_directory
+        os.makedirs(persist_directory, exist_ok=True)
+        self.index_path = os.path.join(persist_directory, self.INDEX_FILE)
+
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._mmapped = False
+        self.index: Optional[faiss.Index] = None
+        if os.path.exists(self.index_path):
+            self.index = faiss.read_index(self.index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            self._mmapped = True
+
+        self._db = sqlite3.connect(
+            os.path.join(persist_directory, self.META_FILE), check_same_thread=False
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS vector ("
+            " int_id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " id TEXT NOT NULL,"
+            " document_id INTEGER,"
+            " content TEXT,"
+            " metadata TEXT,"
+            " deleted INTEGER NOT NULL DEFAULT 0"
+            ")"
+        )
+        # Deleted HNSW rows keep their ID until the next rebuild, so uniqueness only covers live rows
+        self._db.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_vector_id ON vector (id) WHERE deleted = 0")
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_vector_document_id ON vector (document_id, deleted)")
+        self._db.commit()
+
+    # Index management
+
+    def _new_index(self, dimension: int) -> faiss.Index:
+        if self.index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(dimension, settings.FAISS_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = settings.FAISS_HNSW_EF_CONSTRUCTION
+            return faiss.IndexIDMap2(index)
+        # IVF also starts out flat; _train_ivf replaces it once there is enough data
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+
+    def _writable(self, dimension: int) -> faiss.Index:
+        if self.index is None:
+            self.index = self._new_index(dimension)
+        elif self._mmapped:
+            # Memory-mapped indexes are read-only; load a private copy to modify
+            self.index = faiss.read_index(self.index_path)
+            self._mmapped = False
+        if self.index.d != dimension:
+            raise ValueError(f"Embedding dimension {dimension} does not match index dimension {self.index.d}")
+        return self.index
+
+    def _is_ivf(self) -> bool:
+        return isinstance(faiss.downcast_index(self.index), faiss.IndexIVF)
+
+    def _live_int_ids(self) -> np.ndarray:
+        rows = self._db.execute("SELECT int_id FROM vector WHERE deleted = 0").fetchall()
+        return np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+
+    def _reconstruct(self, int_ids: np.ndarray) -> np.ndarray:
+        return self.index.reconstruct_batch(int_ids)
+
+    def _rebuild(self, index: faiss.Index) -> None:
+        """Move every live vector into ``index`` and make it the current index."""
+        int_ids = self._live_int_ids()
+        if len(int_ids):
+            index.add_with_ids(self._reconstruct(int_ids), int_ids)
+        self.index = index
+        self._db.execute("DELETE FROM vector WHERE deleted = 1")
+        self._dirty = True
+
+    def _train_ivf(self) -> None:
+        """Replace the staging flat index with a trained IVF index once enough vectors exist."""
+        if self._is_ivf():
+            return
+        count = self.index.ntotal
+        if count < settings.FAISS_IVF_MIN_TRAIN_SIZE:
+            return
+        nlist = max(1, min(settings.FAISS_IVF_NLIST, count // self.IVF_MIN_POINTS_PER_LIST))
+        int_ids = self._live_int_ids()
+        vectors = self._reconstruct(int_ids)
+        quantizer = faiss.IndexFlatIP(self.index.d)
+        ivf = faiss.IndexIVFFlat(quantizer, self.index.d, nlist, faiss.METRIC_INNER_PRODUCT)
+        ivf.train(vectors)
+        ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+        ivf.add_with_ids(vectors, int_ids)
+        self.index = ivf
+        self._dirty = True
+
+    def rebuild(self) -> None:
+        """Rebuild the index from scratch, e.g. to retrain IVF lists after heavy growth."""
+        with self._lock:
+            if self.index is None:
+                return
+            self._writable(self.index.d)
+            # For IVF this stages the vectors in a flat index and retrains below
+            self._rebuild(self._new_index(self.index.d))
+            if self.index_type == "ivf":
+                self._train_ivf()
+            self.persist()
+
+    # VectorStore interface
+
+    def add(self, ids, embeddings, texts, metadatas) -> None:
+        if not ids:
+            return
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        with self._lock:
+            self._writable(vectors.shape[1])
+            self._delete_locked(ids)
+
+            int_ids = []
+            for id_, text, metadata in zip(ids, texts, metadatas):
+                cursor = self._db.execute(
+                    "INSERT INTO vector (id, document_id, content, metadata) VALUES (?, ?, ?, ?)",
+                    (id_, metadata.get("document_id"), text, json.dumps(metadata)),
+                )
+                int_ids.append(cursor.lastrowid)
+            # Deleting may have rebuilt the index, so look it up again
+            self.index.add_with_ids(vectors, np.asarray(int_ids, dtype=np.int64))
+            self._db.commit()
+            self._dirty = True
+
+            if self.index_type == "ivf":
+                self._train_ivf()
+
+    def _delete_locked(self, ids: Sequence[str]) -> None:
+        int_ids: List[int] = []
+        for start in range(0, len(ids), 500):
+            batch = list(ids[start:start + 500])
+            placeholders = ",".join("?" * len(batch))
+            rows = self._db.execute(
+                f"SELECT int_id FROM vector WHERE deleted = 0 AND id IN ({placeholders})", batch
+            ).fetchall()
+            int_ids.extend(r[0] for r in rows)
+        self._remove_int_ids(int_ids)
+
+    def _remove_int_ids(self, int_ids: List[int]) -> None:
+        if not int_ids:
+            return
+        self._writable(self.index.d)
+        if self.index_type == "hnsw":
+            # HNSW cannot remove vectors; hide them until the next rebuild
+            self._db.executemany("UPDATE vector SET deleted = 1 WHERE int_id = ?", [(i,) for i in int_ids])
+            self._db.commit()
+            deleted = self._db.execute("SELECT COUNT(*) FROM vector WHERE deleted = 1").fetchone()[0]
+            if deleted > settings.FAISS_HNSW_REBUILD_FRACTION * max(self.index.ntotal, 1):
+                self._rebuild(self._new_index(self.index.d))
+        else:
+            # IVF's hashtable direct map only accepts an array selector
+            self.index.remove_ids(faiss.IDSelectorArray(np.asarray(int_ids, dtype=np.int64)))
+            self._db.executemany("DELETE FROM vector WHERE int_id = ?", [(i,) for i in int_ids])
+        self._db.commit()
+        self._dirty = True
+
+    def delete(self, ids) -> None:
+        if not ids or self.index is None:
+            return
+        with self._lock:
+            self._delete_locked(list(ids))
+
+    def delete_document(self, document_id: int) -> None:
+        if self.index is None:
+            return
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT int_id FROM vector WHERE deleted = 0 AND document_id = ?", (document_id,)
+            ).fetchall()
+            self._remove_int_ids([r[0] for r in rows])
+
+    def reassign_document(self, old_document_id: int, new_document_id: int) -> None:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT int_id, metadata FROM vector WHERE document_id = ?", (old_document_id,)
+            ).fetchall()
+            updates = []
+            for int_id, metadata in rows:
+                metadata = json.loads(metadata)
+                metadata["document_id"] = new_document_id
+                updates.append((new_document_id, json.dumps(metadata), int_id))
+            self._db.executemany(
+                "UPDATE vector SET document_id = ?, metadata = ? WHERE int_id = ?", updates
+            )
+            self._db.commit()
+
+    def _search_params(self, selector: Optional[faiss.IDSelector]):
+        base = faiss.downcast_index(self.index.index) if isinstance(self.index, faiss.IndexIDMap2) else self.index
+        if isinstance(base, faiss.IndexHNSW):
+            params = faiss.SearchParametersHNSW()
+            params.efSearch = settings.FAISS_HNSW_EF_SEARCH
+        elif isinstance(faiss.downcast_index(self.index), faiss.IndexIVF):
+            params = faiss.SearchParametersIVF()
+            params.nprobe = settings.FAISS_IVF_NPROBE
+        else:
+            params = faiss.SearchParameters()
+        if selector is not None:
+            params.sel = selector
+        return params
+
+    def search(self, query_embedding, top_k, document_id=None) -> List[SearchResult]:
+        query = np.asarray(query_embedding, dtype=np.float32).reshape(1, -1)
+        with self._lock:
+            if self.index is None or self.index.ntotal == 0:
+                return []
+
+            selector = None
+            if document_id is not None:
+                rows = self._db.execute(
+                    "SELECT int_id FROM vector WHERE deleted = 0 AND document_id = ?", (document_id,)
+                ).fetchall()
+                if not rows:
+                    return []
+                int_ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+                if len(int_ids) <= settings.FAISS_EXACT_SEARCH_THRESHOLD:
+                    # Score the document's vectors directly
+                    scores = self._reconstruct(int_ids) @ query[0]
+                    k = min(top_k, len(scores))
+                    top = np.argpartition(-scores, k - 1)[:k]
+                    top = top[np.argsort(-scores[top])]
+                    return self._results(int_ids[top], scores[top])
+                selector = faiss.IDSelectorBatch(int_ids)
+            elif self.index_type == "hnsw":
+                deleted = self._db.execute("SELECT int_id FROM vector WHERE deleted = 1").fetchall()
+                if deleted:
+                    selector = faiss.IDSelectorNot(faiss.IDSelectorBatch(
+                        np.fromiter((r[0] for r in deleted), dtype=np.int64, count=len(deleted))
+                    ))
+
+            scores, found = self.index.search(query, top_k, params=self._search_params(selector))
+            mask = found[0] >= 0
+            return self._results(found[0][mask], scores[0][mask])
+
+    def _results(self, int_ids: np.ndarray, scores: np.ndarray) -> List[SearchResult]:
+        if len(int_ids) == 0:
+            return []
+        placeholders = ",".join("?" * len(int_ids))
+        rows = self._db.execute(
+            f"SELECT int_id, id, content, metadata FROM vector WHERE int_id IN ({placeholders})",
+            [int(i) for i in int_ids],
+        ).fetchall()
+        by_int_id = {row[0]: row[1:] for row in rows}
+        results = []
+        for int_id, score in zip(int_ids, scores):
+            row = by_int_id.get(int(int_id))
+            if row is not None:
+                id_, content, metadata = row
+                results.append(SearchResult(id_, content, json.loads(metadata), float(score)))
+        return results
+
+    def persist(self) -> None:
+        with self._lock:
+            if not self._dirty or self.index is None:
+                return
+            tmp_path = f"{self.index_path}.tmp"
+            faiss.write_index(self.index, tmp_path)
+            os.replace(tmp_path, self.index_path)
+            self._dirty = False
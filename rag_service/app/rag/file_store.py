@@ -0,0 +1,82 @@
+import os
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.stored_file import StoredFile
+from app.rag.document_processor import SavedFile
+
+
+class FileStore:
+    """
+    Content-addressed storage for uploaded files.
+
+    Each distinct file is kept once under ``objects/<hash[:2]>/<hash>`` and
+    reference counted through the ``storedfile`` table. Both ``acquire`` and
+    ``release`` lock the hash's row for the rest of the caller's transaction,
+    so a file is never removed while another upload of the same bytes is
+    being committed.
+    """
+
+    def __init__(self):
+        self.objects_folder = os.path.join(settings.UPLOAD_FOLDER, "objects")
+        os.makedirs(self.objects_folder, exist_ok=True)
+
+    def object_path(self, content_hash: str) -> str:
+        return os.path.join(self.objects_folder, content_hash[:2], content_hash)
+
+    def acquire(self, db: Session, saved_file: SavedFile) -> str:
+        """
+        Take a reference to a staged upload and return its stored path.
+
+        The staged file is moved into place if these bytes are not stored
+        yet, and discarded otherwise. The caller must commit ``db``.
+        """
+        path = self.object_path(saved_file.content_hash)
+        # Upserting locks the row until the caller commits
+        db.execute(
+            insert(StoredFile)
+            .values(
+                content_hash=saved_file.content_hash,
+                file_path=path,
+                file_size=saved_file.size,
+                ref_count=1,
+            )
+            .on_conflict_do_update(
+                index_elements=[StoredFile.content_hash],
+                set_={"ref_count": StoredFile.ref_count + 1},
+            )
+        )
+
+        if os.path.exists(path):
+            os.remove(saved_file.path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(saved_file.path, path)
+        return path
+
+    def release(self, db: Session, content_hash: str) -> None:
+        """
+        Drop a reference and remove the file once nothing points at it.
+
+        The caller must commit ``db``.
+        """
+        stored_file = db.query(StoredFile).filter(
+            StoredFile.content_hash == content_hash
+        ).with_for_update().first()
+        if stored_file is None:
+            return
+
+        stored_file.ref_count -= 1
+        if stored_file.ref_count > 0:
+            db.add(stored_file)
+            return
+
+        db.delete(stored_file)
+        if os.path.exists(stored_file.file_path):
+            os.remove(stored_file.file_path)
+
+
+# Create a global instance
+file_store = FileStore()
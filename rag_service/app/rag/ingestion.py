@@ -0,0 +1,391 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import islice
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import and_, exists, or_
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.sql import func
+
+from app.core.config import settings
+from app.core.metrics import observe_stage
+from app.db.session import SessionLocal
+from app.models.chunk import Chunk
+from app.models.document import Document
+from app.models.ingestion_job import IngestionJob
+from app.rag.chunk_diff import (
+    ChunkDiffer,
+    NewChunk,
+    delete_chunks,
+    insert_chunks,
+    load_stored_chunks,
+    renumber_chunks,
+)
+from app.rag.deduplication import find_processed_duplicate
+from app.rag.document_processor import document_processor
+from app.rag.keyword_index import keyword_index_store
+from app.rag.query_cache import query_cache
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def job_stage(db: Session, job: IngestionJob, stage: str) -> Iterator[None]:
+    """Mark the job as being in a pipeline stage and record how long it took."""
+    job.stage = stage
+    db.add(job)
+    db.commit()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        # Reassign so SQLAlchemy notices the change to the JSON column
+        job.timings = {**(job.timings or {}), stage: round(elapsed_ms, 3)}
+
+
+def run_pipeline(db: Session, document: Document, job: IngestionJob) -> int:
+    """
+    Extract, chunk and embed a document, storing chunks in the database.
+
+    The document is streamed: text is read in blocks, chunked as it arrives
+    and handled CHUNK_STREAM_BATCH_SIZE chunks at a time, so memory use does
+    not grow with the file size beyond a few bytes of bookkeeping per chunk.
+    Each batch is diffed against the chunks stored by an earlier run; only
+    new chunks are embedded and inserted, and chunks that no longer exist are
+    deleted at the end. All chunk writes land in one transaction.
+
+    Returns the number of chunks in the document.
+    """
+    from app.rag.embedding_pipeline import EmbeddingBatch, make_batches
+    from app.rag.embeddings import embedding_manager
+
+    # Reuse the chunks and vectors of an identical, already-processed document
+    with job_stage(db, job, "deduplicating"):
+        if document.source_document_id is None and not document.embedding_status:
+            duplicate = find_processed_duplicate(db, document)
+            if duplicate is not None:
+                document.source_document_id = duplicate.id
+
+    if document.source_document_id is not None:
+        chunks_count = db.query(Chunk).filter(Chunk.document_id == document.source_document_id).count()
+        job.chunks_total = job.chunks_processed = chunks_count
+        document.embedding_status = True
+        db.add(document)
+        db.add(job)
+        db.commit()
+        return chunks_count
+
+    # Load what is needed to match the new chunks against those stored by an earlier run
+    with job_stage(db, job, "diffing"):
+        differ = ChunkDiffer(load_stored_chunks(db, document.id), document.id)
+
+    batch_size = settings.CHUNK_INSERT_BATCH_SIZE
+    keyword_builder = keyword_index_store.builder(document.id)
+    added_ids: List[str] = []
+    pending: Dict[str, NewChunk] = {}  # Chunks being embedded, by embedding ID
+    batch_latencies: List[float] = []
+    substage_ms = {"extraction": 0.0, "chunking": 0.0, "persisting": 0.0}
+
+    def timed_blocks(blocks: Iterator[str]) -> Iterator[str]:
+        # Extraction runs lazily inside chunking, so time it separately
+        while True:
+            start = time.perf_counter()
+            block = next(blocks, None)
+            substage_ms["extraction"] += (time.perf_counter() - start) * 1000
+            if block is None:
+                return
+            yield block
+
+    def embedding_batches() -> Iterator[EmbeddingBatch]:
+        if document.file_path:
+            blocks = document_processor.iter_document_text(document.file_path, document.file_type)
+        else:
+            blocks = document_processor.iter_text_blocks(document.content or "")
+        chunks = document_processor.iter_chunks(timed_blocks(iter(blocks)))
+        while True:
+            start = time.perf_counter()
+            extraction_ms = substage_ms["extraction"]
+            texts = list(islice(chunks, settings.CHUNK_STREAM_BATCH_SIZE))
+            if texts:
+                diff = differ.feed(texts)
+                keyword_builder.add(diff.embedding_ids, texts)
+            substage_ms["chunking"] += (time.perf_counter() - start) * 1000 - (substage_ms["extraction"] - extraction_ms)
+            if not texts:
+                break
+
+            start = time.perf_counter()
+            renumber_chunks(db, diff.moved, batch_size)
+            substage_ms["persisting"] += (time.perf_counter() - start) * 1000
+
+            for chunk in diff.added:
+                pending[chunk.embedding_id] = chunk
+                added_ids.append(chunk.embedding_id)
+            yield from make_batches(
+                [chunk.embedding_id for chunk in diff.added],
+                [chunk.content for chunk in diff.added],
+                [{"document_id": document.id} for _ in diff.added],
+                settings.EMBEDDING_BATCH_SIZE,
+            )
+
+    def insert_written(batch: EmbeddingBatch) -> None:
+        start = time.perf_counter()
+        insert_chunks(db, document.id, [pending.pop(id_) for id_ in batch.ids], batch_size)
+        substage_ms["persisting"] += (time.perf_counter() - start) * 1000
+
+    try:
+        # Stream the document through chunking, diffing and embedding of new chunks
+        with job_stage(db, job, "processing"):
+            embedding_manager.create_embeddings(
+                embedding_batches(),
+                on_written=insert_written,
+                on_batch=lambda batch: batch_latencies.append(batch.latency_ms)
+            )
+            removed = differ.finish()
+            delete_chunks(db, removed, batch_size)
+            logger.info(
+                "Document %s: %s chunks, %s new, %s removed",
+                document.id, differ.chunk_count, len(added_ids), len(removed),
+            )
+
+            job.chunks_total = job.chunks_processed = differ.chunk_count
+            document.embedding_status = True
+            db.add(document)
+            db.add(job)
+            db.commit()
+    except Exception:
+        # Don't leave vectors behind that no chunk row refers to
+        db.rollback()
+        keyword_builder.discard()
+        try:
+            embedding_manager.delete_embeddings(added_ids)
+        except Exception:
+            logger.exception("Failed to remove vectors of document %s after a failed run", document.id)
+        raise
+
+    timings = {name: round(elapsed_ms, 3) for name, elapsed_ms in substage_ms.items()}
+    for name in ("extraction", "chunking"):
+        observe_stage(name, substage_ms[name] / 1000)
+    if batch_latencies:
+        timings["embedding_batch_avg"] = round(sum(batch_latencies) / len(batch_latencies), 3)
+        timings["embedding_batch_max"] = round(max(batch_latencies), 3)
+    job.timings = {**job.timings, **timings}
+
+    # Drop vectors of removed chunks once no stored chunk refers to them
+    embedding_manager.delete_embeddings([chunk.embedding_id for chunk in removed if chunk.embedding_id])
+
+    # Publish the keyword index used by keyword and hybrid search
+    with job_stage(db, job, "indexing"):
+        keyword_index_store.save(document.id, keyword_builder)
+    db.add(job)
+    db.commit()
+
+    return differ.chunk_count
+
+
+class IngestionQueue:
+    """
+    Durable queue of document processing jobs backed by the ``ingestionjob`` table.
+
+    Jobs are claimed with ``SELECT ... FOR UPDATE SKIP LOCKED`` so several
+    workers, in this process or others, can drain the same table. A claimed
+    job holds a lease that its worker keeps renewing; if the process dies the
+    lease lapses and the job is picked up again, up to
+    ``INGESTION_MAX_ATTEMPTS`` times.
+    """
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self._workers: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    def enqueue(self, db: Session, document: Document, user_id: int, content_changed: bool = False) -> IngestionJob:
+        """
+        Queue a document for processing.
+
+        If the document already has a queued or running job, that job is
+        returned instead of creating a duplicate. With ``content_changed``
+        only a queued job is reused, since a running one may have read the
+        old content.
+        """
+        active_statuses = ["queued"] if content_changed else ["queued", "running"]
+        job = db.query(IngestionJob).filter(
+            IngestionJob.document_id == document.id,
+            IngestionJob.status.in_(active_statuses),
+        ).first()
+        if job is None:
+            job = IngestionJob(
+                document_id=document.id,
+                user_id=user_id,
+                status="queued",
+                stage="queued",
+                timings={},
+            )
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def start(self) -> None:
+        """Start the worker pool."""
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._workers = [
+            asyncio.create_task(self._worker(i)) for i in range(self.concurrency)
+        ]
+
+    async def stop(self) -> None:
+        """
+        Stop the worker pool.
+
+        Jobs that are still running keep their database state and are picked
+        up again once their lease lapses.
+        """
+        self._stopping = True
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _worker(self, index: int) -> None:
+        while not self._stopping:
+            try:
+                job_id = await asyncio.to_thread(self._claim_next)
+            except Exception:
+                logger.exception("Ingestion worker %s failed to claim a job", index)
+                job_id = None
+
+            if job_id is None:
+                # Sleep until a job is enqueued or the poll interval elapses
+                try:
+                    await asyncio.wait_for(
+                        self._wakeup.wait(), timeout=settings.INGESTION_POLL_INTERVAL_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            heartbeat = asyncio.create_task(self._heartbeat(job_id))
+            try:
+                await asyncio.to_thread(self._execute, job_id)
+            except Exception:
+                logger.exception("Ingestion job %s crashed", job_id)
+            finally:
+                heartbeat.cancel()
+
+    async def _heartbeat(self, job_id: int) -> None:
+        interval = settings.INGESTION_LEASE_SECONDS / 3
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(self._renew_lease, job_id)
+
+    def _lease_expiry(self):
+        return func.now() + timedelta(seconds=settings.INGESTION_LEASE_SECONDS)
+
+    def _claim_next(self) -> Optional[int]:
+        """Claim the oldest runnable job and return its id."""
+        db = SessionLocal()
+        # A document's jobs run one at a time, so reprocessing runs never interleave
+        running = aliased(IngestionJob)
+        document_busy = exists().where(
+            running.document_id == IngestionJob.document_id,
+            running.id != IngestionJob.id,
+            running.status == "running",
+            running.lease_expires_at >= func.now(),
+        )
+        try:
+            while True:
+                job = db.query(IngestionJob).filter(
+                    or_(
+                        and_(IngestionJob.status == "queued", ~document_busy),
+                        and_(
+                            IngestionJob.status == "running",
+                            IngestionJob.lease_expires_at < func.now(),
+                        ),
+                    )
+                ).order_by(IngestionJob.id).with_for_update(skip_locked=True).first()
+                if job is None:
+                    db.rollback()
+                    return None
+
+                if job.attempts >= settings.INGESTION_MAX_ATTEMPTS:
+                    # The job keeps taking its worker down; stop retrying it
+                    job.status = "failed"
+                    job.error = job.error or "Worker lost the job too many times"
+                    job.finished_at = func.now()
+                    db.commit()
+                    continue
+
+                job.status = "running"
+                job.attempts = (job.attempts or 0) + 1
+                job.lease_expires_at = self._lease_expiry()
+                job.started_at = func.now()
+                job.error = None
+                db.commit()
+                return job.id
+        finally:
+            db.close()
+
+    def _renew_lease(self, job_id: int) -> None:
+        db = SessionLocal()
+        try:
+            db.query(IngestionJob).filter(
+                IngestionJob.id == job_id,
+                IngestionJob.status == "running",
+            ).update({IngestionJob.lease_expires_at: self._lease_expiry()}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def _execute(self, job_id: int) -> None:
+        """Run the pipeline for a claimed job and record the outcome."""
+        db = SessionLocal()
+        try:
+            job = db.query(IngestionJob).filter(IngestionJob.id == job_id).first()
+            if job is None:
+                return
+            document = db.query(Document).filter(Document.id == job.document_id).first()
+            if document is None:
+                job.status = "failed"
+                job.error = "Document not found"
+                job.finished_at = func.now()
+                db.commit()
+                return
+
+            document_id = document.id
+            try:
+                run_pipeline(db, document, job)
+            except Exception as e:
+                logger.exception("Ingestion job %s failed", job_id)
+                db.rollback()
+                job = db.query(IngestionJob).filter(IngestionJob.id == job_id).first()
+                if job is None:
+                    return
+                job.status = "failed"
+                job.error = str(e)
+                job.finished_at = func.now()
+                db.commit()
+                return
+            finally:
+                # Responses cached before this run may quote chunks that changed
+                query_cache.invalidate_document(document_id)
+
+            job.status = "completed"
+            job.stage = "completed"
+            job.finished_at = func.now()
+            db.add(job)
+            db.commit()
+        finally:
+            db.close()
+
+
+# Create a global instance
+ingestion_queue = IngestionQueue(concurrency=settings.INGESTION_CONCURRENCY)
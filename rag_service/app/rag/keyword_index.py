@@ -0,0 +1,304 @@
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.rag.vector_store import SearchResult
+
+# Words, numbers and identifiers such as "ERR-404", "v1.2.3" or "user_id"
+_TOKEN_RE = re.compile(r"\w+(?:[-.:/]\w+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase index terms.
+
+    Compound identifiers are indexed both whole and by their parts, so
+    "ERR-404" matches queries for "err-404", "err" and "404".
+    """
+    terms = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        terms.append(token)
+        if not token.isalnum():
+            terms.extend(part for part in re.split(r"[-.:/_]", token) if part)
+    return terms
+
+
+class KeywordIndex:
+    """
+    BM25 index over one document's chunks in compressed sparse row form.
+
+    ``terms`` is sorted, and term ``t``'s postings are
+    ``chunks[indptr[t]:indptr[t + 1]]`` with matching term frequencies in
+    ``tfs``. Chunk texts are kept in one UTF-8 buffer with offsets, so
+    results can be returned without touching the database. On disk the
+    buffer is a separate file that is memory-mapped on load.
+    """
+
+    ARRAYS = ("ids", "terms", "indptr", "chunks", "tfs", "lengths", "text_offsets")
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        terms: np.ndarray,
+        indptr: np.ndarray,
+        chunks: np.ndarray,
+        tfs: np.ndarray,
+        lengths: np.ndarray,
+        text_data: np.ndarray,
+        text_offsets: np.ndarray,
+    ):
+        self.ids = ids
+        self.terms = terms
+        self.indptr = indptr
+        self.chunks = chunks
+        self.tfs = tfs
+        self.lengths = lengths
+        self.text_data = text_data
+        self.text_offsets = text_offsets
+        self.avg_length = float(lengths.mean()) if len(lengths) else 0.0
+
+    @staticmethod
+    def _map_text(text_path: str) -> np.ndarray:
+        if os.path.getsize(text_path) == 0:
+            return np.empty(0, dtype=np.uint8)
+        return np.memmap(text_path, dtype=np.uint8, mode="r")
+
+    @classmethod
+    def load(cls, path: str, text_path: str) -> "KeywordIndex":
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in cls.ARRAYS}
+        return cls(text_data=cls._map_text(text_path), **arrays)
+
+    def save(self, path: str) -> None:
+        """Save the arrays; the text file is written by ``KeywordIndexBuilder``."""
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, **{name: getattr(self, name) for name in self.ARRAYS})
+        os.replace(tmp_path, path)
+
+    def text(self, chunk: int) -> str:
+        start, end = self.text_offsets[chunk], self.text_offsets[chunk + 1]
+        return self.text_data[start:end].tobytes().decode("utf-8")
+
+    def score(self, query: str) -> np.ndarray:
+        """BM25 score of every chunk for the query."""
+        k1, b = settings.BM25_K1, settings.BM25_B
+        scores = np.zeros(len(self.lengths), dtype=np.float32)
+        if not len(self.terms):
+            return scores
+        norm = k1 * (1 - b + b * self.lengths / max(self.avg_length, 1e-9))
+
+        query_terms = np.array(sorted(set(tokenize(query))), dtype=str)
+        if not len(query_terms):
+            return scores
+        positions = np.searchsorted(self.terms, query_terms)
+        found = positions < len(self.terms)
+        found[found] = self.terms[positions[found]] == query_terms[found]
+
+        n = len(self.lengths)
+        for t in positions[found]:
+            start, end = self.indptr[t], self.indptr[t + 1]
+            df = end - start
+            idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+            chunks = self.chunks[start:end]
+            tfs = self.tfs[start:end]
+            scores[chunks] += idf * tfs * (k1 + 1) / (tfs + norm[chunks])
+        return scores
+
+    def search(self, query: str, top_k: int, document_id: int) -> List[SearchResult]:
+        scores = self.score(query)
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        matched = matched[np.argsort(-scores[matched])]
+        return [
+            SearchResult(
+                str(self.ids[chunk]),
+                self.text(chunk),
+                {"document_id": document_id, "chunk_index": int(chunk)},
+                float(scores[chunk]),
+            )
+            for chunk in matched
+        ]
+
+
+class KeywordIndexBuilder:
+    """
+    Build a KeywordIndex from chunks fed in batches, in document order.
+
+    Chunk texts go straight to ``text_path`` and postings are kept as
+    compact integer arrays, so the chunk texts never need to be in memory
+    all at once.
+    """
+
+    def __init__(self, text_path: str):
+        self.text_path = text_path
+        self._text_file = open(text_path, "wb")
+        self._vocabulary: Dict[str, int] = {}
+        self._ids: List[str] = []
+        self._lengths: List[int] = []
+        self._offsets: List[int] = [0]
+        self._term_ids: List[np.ndarray] = []
+        self._chunks: List[np.ndarray] = []
+        self._tfs: List[np.ndarray] = []
+
+    def add(self, ids: Sequence[str], texts: Sequence[str]) -> None:
+        term_ids: List[int] = []
+        chunks: List[int] = []
+        tfs: List[int] = []
+        for id_, text in zip(ids, texts):
+            chunk = len(self._ids)
+            counts = Counter(tokenize(text))
+            for term, tf in counts.items():
+                term_ids.append(self._vocabulary.setdefault(term, len(self._vocabulary)))
+                chunks.append(chunk)
+                tfs.append(tf)
+            encoded = text.encode("utf-8")
+            self._text_file.write(encoded)
+            self._ids.append(id_)
+            self._lengths.append(sum(counts.values()))
+            self._offsets.append(self._offsets[-1] + len(encoded))
+        self._term_ids.append(np.array(term_ids, dtype=np.int32))
+        self._chunks.append(np.array(chunks, dtype=np.int32))
+        self._tfs.append(np.array(tfs, dtype=np.int32))
+
+    def finish(self) -> KeywordIndex:
+        self._text_file.close()
+        terms = sorted(self._vocabulary)
+        rank = np.empty(len(terms), dtype=np.int32)
+        for position, term in enumerate(terms):
+            rank[self._vocabulary[term]] = position
+
+        term_positions = rank[np.concatenate(self._term_ids)] if self._term_ids else np.empty(0, dtype=np.int32)
+        # Stable, so each term's postings stay in chunk order
+        order = np.argsort(term_positions, kind="stable")
+        indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(np.bincount(term_positions, minlength=len(terms)))
+
+        return KeywordIndex(
+            ids=np.array(self._ids, dtype=str),
+            terms=np.array(terms, dtype=str),
+            indptr=indptr,
+            chunks=np.concatenate(self._chunks)[order] if self._chunks else np.empty(0, dtype=np.int32),
+            tfs=np.concatenate(self._tfs)[order] if self._tfs else np.empty(0, dtype=np.int32),
+            lengths=np.array(self._lengths, dtype=np.int32),
+            text_data=KeywordIndex._map_text(self.text_path),
+            text_offsets=np.array(self._offsets, dtype=np.int64),
+        )
+
+    def discard(self) -> None:
+        self._text_file.close()
+        if os.path.exists(self.text_path):
+            os.remove(self.text_path)
+
+
+class KeywordIndexStore:
+    """
+    Per-document keyword indexes saved as ``<document_id>.npz`` files, with
+    chunk texts in ``<document_id>.text``.
+
+    Recently used indexes are kept in memory, up to
+    ``KEYWORD_INDEX_CACHE_SIZE`` documents.
+    """
+
+    def __init__(self, directory: str, cache_size: int):
+        self.directory = directory
+        self.cache_size = cache_size
+        os.makedirs(directory, exist_ok=True)
+        self._cache: "OrderedDict[int, KeywordIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, document_id: int) -> str:
+        return os.path.join(self.directory, f"{document_id}.npz")
+
+    def _text_path(self, document_id: int) -> str:
+        return os.path.join(self.directory, f"{document_id}.text")
+
+    def _remember(self, document_id: int, index: KeywordIndex) -> None:
+        self._cache[document_id] = index
+        self._cache.move_to_end(document_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def builder(self, document_id: int) -> KeywordIndexBuilder:
+        """Start building a new index for a document; pass it to ``save`` when done."""
+        return KeywordIndexBuilder(f"{self._text_path(document_id)}.tmp")
+
+    def save(self, document_id: int, builder: KeywordIndexBuilder) -> None:
+        """Finish a builder and make its index the document's current one."""
+        builder.finish().save(self._path(document_id))
+        os.replace(builder.text_path, self._text_path(document_id))
+        with self._lock:
+            self._cache.pop(document_id, None)
+
+    def build(self, document_id: int, ids: Sequence[str], texts: Sequence[str]) -> None:
+        """Index a document's chunks, replacing any previous index."""
+        builder = self.builder(document_id)
+        builder.add(ids, texts)
+        self.save(document_id, builder)
+
+    def get(self, document_id: int) -> Optional[KeywordIndex]:
+        with self._lock:
+            index = self._cache.get(document_id)
+            if index is not None:
+                self._cache.move_to_end(document_id)
+                return index
+        path = self._path(document_id)
+        if not os.path.exists(path) or not os.path.exists(self._text_path(document_id)):
+            return None
+        index = KeywordIndex.load(path, self._text_path(document_id))
+        with self._lock:
+            self._remember(document_id, index)
+        return index
+
+    def delete(self, document_id: int) -> None:
+        with self._lock:
+            self._cache.pop(document_id, None)
+            for path in (self._path(document_id), self._text_path(document_id)):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def reassign(self, old_document_id: int, new_document_id: int) -> None:
+        with self._lock:
+            self._cache.pop(old_document_id, None)
+            self._cache.pop(new_document_id, None)
+            for old_path, new_path in (
+                (self._path(old_document_id), self._path(new_document_id)),
+                (self._text_path(old_document_id), self._text_path(new_document_id)),
+            ):
+                if os.path.exists(old_path):
+                    os.replace(old_path, new_path)
+
+    def search(self, query: str, document_id: Optional[int] = None, top_k: int = 3) -> List[SearchResult]:
+        """
+        BM25 search within one document, or across every indexed document.
+
+        Scores are only comparable within a document, since term statistics
+        are per document; cross-document results are merged on raw scores.
+        """
+        if document_id is not None:
+            document_ids = [document_id]
+        else:
+            document_ids = [
+                int(name[:-4]) for name in os.listdir(self.directory)
+                if name.endswith(".npz") and name[:-4].isdigit()
+            ]
+
+        results: List[SearchResult] = []
+        for doc_id in document_ids:
+            index = self.get(doc_id)
+            if index is not None:
+                results.extend(index.search(query, top_k, doc_id))
+        results.sort(key=lambda r: r.score, reverse=True)
+        return results[:top_k]
+
+
+# Create a global instance
+keyword_index_store = KeywordIndexStore(
+    settings.KEYWORD_INDEX_DIR,
+    cache_size=settings.KEYWORD_INDEX_CACHE_SIZE
+)
@@ -0,0 +1,243 @@
+import heapq
+import json
+import os
+import threading
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from app.rag.vector_store import SearchResult, VectorStore
+
+
+class DocumentPartition:
+    """
+    One document's vectors as a contiguous float32 matrix, plus their IDs,
+    texts and metadata in the same row order.
+
+    Rows live in a buffer with spare capacity, so appends are amortized
+    O(1). Deleting a row moves the last row into its place.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        ids: List[str],
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+    ):
+        self._data = vectors
+        self.size = len(ids)
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+        self.rows = {id_: row for row, id_ in enumerate(ids)}
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._data[:self.size]
+
+    def _reserve(self, size: int, dimension: int) -> None:
+        # Memory-mapped buffers are read-only, so the first write copies them
+        if size <= len(self._data) and self._data.flags.writeable:
+            return
+        capacity = max(size, 2 * len(self._data), 16)
+        data = np.empty((capacity, dimension), dtype=np.float32)
+        data[:self.size] = self._data[:self.size]
+        self._data = data
+
+    def upsert(self, ids, vectors: np.ndarray, texts, metadatas) -> None:
+        new = sum(1 for id_ in ids if id_ not in self.rows)
+        self._reserve(self.size + new, vectors.shape[1])
+        for id_, vector, text, metadata in zip(ids, vectors, texts, metadatas):
+            row = self.rows.get(id_)
+            if row is None:
+                row = self.size
+                self.size += 1
+                self.rows[id_] = row
+                self.ids.append(id_)
+                self.texts.append(text)
+                self.metadatas.append(metadata)
+            else:
+                self.texts[row] = text
+                self.metadatas[row] = metadata
+            self._data[row] = vector
+
+    def remove(self, id_: str) -> None:
+        row = self.rows.pop(id_)
+        last = self.size - 1
+        self._reserve(self.size, self._data.shape[1])
+        if row != last:
+            self._data[row] = self._data[last]
+            self.ids[row] = self.ids[last]
+            self.texts[row] = self.texts[last]
+            self.metadatas[row] = self.metadatas[last]
+            self.rows[self.ids[row]] = row
+        self.ids.pop()
+        self.texts.pop()
+        self.metadatas.pop()
+        self.size = last
+
+    def top_k(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows and scores of the ``k`` best matches, best first."""
+        scores = self.vectors @ query
+        k = min(k, self.size)
+        if k < self.size:
+            rows = np.argpartition(-scores, k - 1)[:k]
+        else:
+            rows = np.arange(self.size)
+        rows = rows[np.argsort(-scores[rows])]
+        return rows, scores[rows]
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    In-process vector store partitioned by document.
+
+    Each document's embeddings form their own contiguous matrix, so a
+    document-scoped search is one matrix-vector product and a partial sort
+    over that document only. Its cost does not depend on the size of the
+    rest of the corpus. Unscoped searches take the top ``k`` of every
+    partition and merge them.
+
+    Partitions are persisted as ``<document_id>.npy`` (vectors) and
+    ``<document_id>.json`` (IDs, texts and metadata). The vector files are
+    memory-mapped at startup, so the OS pages them in on first use.
+    """
+
+    def __init__(self, persist_directory: str):
+        self.persist_directory = persist_directory
+        os.makedirs(persist_directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self.partitions: Dict[int, DocumentPartition] = {}
+        self._locations: Dict[str, int] = {}
+        self._dirty: set = set()
+        self._load()
+
+    def _paths(self, document_id: int) -> Tuple[str, str]:
+        base = os.path.join(self.persist_directory, str(document_id))
+        return f"{base}.npy", f"{base}.json"
+
+    def _load(self) -> None:
+        for name in os.listdir(self.persist_directory):
+            stem, ext = os.path.splitext(name)
+            if ext != ".npy" or not stem.lstrip("-").isdigit():
+                continue
+            document_id = int(stem)
+            vectors_path, meta_path = self._paths(document_id)
+            if not os.path.exists(meta_path):
+                continue
+            with open(meta_path) as f:
+                meta = json.load(f)
+            vectors = np.load(vectors_path, mmap_mode="r")
+            self.partitions[document_id] = DocumentPartition(
+                vectors, meta["ids"], meta["texts"], meta["metadatas"]
+            )
+            for id_ in meta["ids"]:
+                self._locations[id_] = document_id
+
+    def add(self, ids, embeddings, texts, metadatas) -> None:
+        if not ids:
+            return
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        with self._lock:
+            # Vectors moving to another document are removed from their old partition
+            self._delete_locked([
+                id_ for id_, metadata in zip(ids, metadatas)
+                if self._locations.get(id_, metadata["document_id"]) != metadata["document_id"]
+            ])
+
+            groups: Dict[int, List[int]] = {}
+            for i, metadata in enumerate(metadatas):
+                groups.setdefault(metadata["document_id"], []).append(i)
+
+            for document_id, rows in groups.items():
+                partition = self.partitions.get(document_id)
+                if partition is None:
+                    partition = DocumentPartition(np.empty((0, vectors.shape[1]), dtype=np.float32), [], [], [])
+                    self.partitions[document_id] = partition
+                partition.upsert(
+                    [ids[i] for i in rows],
+                    vectors[rows],
+                    [texts[i] for i in rows],
+                    [metadatas[i] for i in rows],
+                )
+                for i in rows:
+                    self._locations[ids[i]] = document_id
+                self._dirty.add(document_id)
+
+    def _delete_locked(self, ids) -> None:
+        for id_ in ids:
+            document_id = self._locations.pop(id_, None)
+            if document_id is None:
+                continue
+            partition = self.partitions[document_id]
+            partition.remove(id_)
+            self._dirty.add(document_id)
+            if partition.size == 0:
+                del self.partitions[document_id]
+
+    def delete(self, ids) -> None:
+        with self._lock:
+            self._delete_locked(ids)
+
+    def delete_document(self, document_id: int) -> None:
+        with self._lock:
+            partition = self.partitions.pop(document_id, None)
+            if partition is None:
+                return
+            for id_ in partition.ids:
+                self._locations.pop(id_, None)
+            self._dirty.add(document_id)
+
+    def reassign_document(self, old_document_id: int, new_document_id: int) -> None:
+        with self._lock:
+            partition = self.partitions.get(old_document_id)
+            if partition is None:
+                return
+            metadatas = [{**metadata, "document_id": new_document_id} for metadata in partition.metadatas]
+            ids, vectors, texts = list(partition.ids), np.array(partition.vectors), list(partition.texts)
+            self.delete_document(old_document_id)
+            self.add(ids, vectors, texts, metadatas)
+
+    def search(self, query_embedding, top_k, document_id=None) -> List[SearchResult]:
+        query = np.asarray(query_embedding, dtype=np.float32)
+        with self._lock:
+            if document_id is not None:
+                partition = self.partitions.get(document_id)
+                partitions = [partition] if partition is not None else []
+            else:
+                partitions = list(self.partitions.values())
+
+            candidates = []
+            for partition in partitions:
+                rows, scores = partition.top_k(query, top_k)
+                candidates.extend((float(score), partition, int(row)) for row, score in zip(rows, scores))
+
+            best = heapq.nlargest(top_k, candidates, key=lambda c: c[0])
+            return [
+                SearchResult(
+                    partition.ids[row], partition.texts[row], partition.metadatas[row], score
+                )
+                for score, partition, row in best
+            ]
+
+    def persist(self) -> None:
+        with self._lock:
+            for document_id in self._dirty:
+                vectors_path, meta_path = self._paths(document_id)
+                partition = self.partitions.get(document_id)
+                if partition is None:
+                    for path in (vectors_path, meta_path):
+                        if os.path.exists(path):
+                            os.remove(path)
+                    continue
+                # Write to temporary files first so a crash never leaves a partial partition
+                with open(f"{vectors_path}.tmp", "wb") as f:
+                    np.save(f, partition.vectors)
+                with open(f"{meta_path}.tmp", "w") as f:
+                    json.dump(
+                        {"ids": partition.ids, "texts": partition.texts, "metadatas": partition.metadatas}, f
+                    )
+                os.replace(f"{vectors_path}.tmp", vectors_path)
+                os.replace(f"{meta_path}.tmp", meta_path)
+            self._dirty.clear()
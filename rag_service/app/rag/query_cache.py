@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.rag.embedding_cache import normalize_text
+
+# (document ID, search mode); queries without a document use None
+Scope = Tuple[Optional[int], str]
+
+
+class CachedResponse(NamedTuple):
+    response: str
+    embedding: Optional[np.ndarray]
+    expires_at: float
+
+
+class QueryCache:
+    """
+    In-memory cache of query responses, with two lookup levels.
+
+    1. Exact: the same normalized query text against the same document and
+       search mode.
+    2. Semantic (optional): a cached query in the same scope whose embedding
+       has cosine similarity of at least ``similarity_threshold`` with the
+       new query's embedding.
+
+    Entries expire after ``ttl_seconds`` and the least recently used are
+    evicted beyond ``max_entries``. A document's entries are dropped when it
+    is reprocessed or deleted.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, similarity_threshold: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[Scope, str], CachedResponse]" = OrderedDict()
+        self._scopes: Dict[Scope, Dict[str, None]] = {}
+        # Stacked embeddings per scope, rebuilt lazily after the scope changes
+        self._matrices: Dict[Scope, Tuple[List[str], np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def _remove(self, key: Tuple[Scope, str]) -> None:
+        scope, text = key
+        self._entries.pop(key, None)
+        texts = self._scopes.get(scope)
+        if texts is not None:
+            texts.pop(text, None)
+            if not texts:
+                del self._scopes[scope]
+        self._matrices.pop(scope, None)
+
+    def _get_exact(self, key: Tuple[Scope, str]) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at < time.monotonic():
+            self._remove(key)
+            entry = None
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry.response
+
+    def _get_similar(self, scope: Scope, query: np.ndarray) -> Optional[str]:
+        if scope not in self._matrices:
+            texts = [
+                text for text in self._scopes.get(scope, ())
+                if self._entries[(scope, text)].embedding is not None
+            ]
+            if not texts:
+                return None
+            self._matrices[scope] = (
+                texts, np.vstack([self._entries[(scope, text)].embedding for text in texts])
+            )
+
+        texts, matrix = self._matrices[scope]
+        similarities = matrix @ query
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None
+        return self._get_exact((scope, texts[best]))
+
+    def lookup(
+        self,
+        query_text: str,
+        document_id: Optional[int],
+        search_mode: str,
+        embed: Optional[Callable[[str], Sequence[float]]] = None,
+    ) -> Tuple[Optional[str], Optional[Sequence[float]]]:
+        """
+        Find a cached response for a query.
+
+        The exact level is tried first. On a miss, if semantic matching is
+        enabled and ``embed`` is given, the query is embedded and compared
+        with cached queries in the same scope. Returns the response (or
+        None) and the query embedding, if one was computed, so the caller
+        can reuse it for the search.
+        """
+        scope = (document_id, search_mode)
+        with self._lock:
+            response = self._get_exact((scope, normalize_text(query_text).lower()))
+            if response is not None:
+                self.exact_hits += 1
+                return response, None
+
+        query_embedding = None
+        if settings.QUERY_CACHE_SEMANTIC_ENABLED and embed is not None:
+            query_embedding = embed(query_text)
+            with self._lock:
+                response = self._get_similar(scope, np.asarray(query_embedding, dtype=np.float32))
+                if response is not None:
+                    self.semantic_hits += 1
+                    return response, query_embedding
+
+        with self._lock:
+            self.misses += 1
+        return None, query_embedding
+
+    def put(
+        self,
+        query_text: str,
+        document_id: Optional[int],
+        search_mode: str,
+        response: str,
+        query_embedding: Optional[Sequence[float]] = None,
+    ) -> None:
+        scope = (document_id, search_mode)
+        key = (scope, normalize_text(query_text).lower())
+        embedding = np.asarray(query_embedding, dtype=np.float32) if query_embedding is not None else None
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = CachedResponse(response, embedding, time.monotonic() + self.ttl_seconds)
+            self._scopes.setdefault(scope, {})[key[1]] = None
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_document(self, document_id: int) -> None:
+        """Drop every cached response for a document."""
+        with self._lock:
+            for scope in [scope for scope in self._scopes if scope[0] == document_id]:
+                for text in list(self._scopes[scope]):
+                    self._remove((scope, text))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._scopes.clear()
+            self._matrices.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "exact_hit_ratio": self.exact_hits / lookups if lookups else 0.0,
+                "semantic_hit_ratio": self.semantic_hits / lookups if lookups else 0.0,
+                "hit_ratio": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+                "similarity_threshold": self.similarity_threshold,
+            }
+
+
+# Create a global instance
+query_cache = QueryCache(
+    max_entries=settings.QUERY_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.QUERY_CACHE_TTL_SECONDS,
+    similarity_threshold=settings.QUERY_CACHE_SIMILARITY_THRESHOLD
+)
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import re
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import Date, cast, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.config import settings
+from app.db.session import async_engine
+from app.models.query import Query
+from app.models.query_rollup import QueryDailyRollup
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key for pg_try_advisory_xact_lock, so one process at a time runs maintenance
+MAINTENANCE_LOCK_KEY = 0x71756572  # "quer"
+_PARTITION_NAME = re.compile(r"^query_p(\d{4})_(\d{2})$")
+
+
+def month_start(day: date, months: int = 0) -> date:
+    """First day of the month ``months`` after (or before) the month of ``day``."""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"query_p{month.year:04d}_{month.month:02d}"
+
+
+async def create_partitions(conn: AsyncConnection, today: date, months_ahead: int) -> None:
+    """Create the monthly partitions from this month to ``months_ahead`` months out."""
+    for offset in range(months_ahead + 1):
+        start = month_start(today, offset)
+        end = month_start(today, offset + 1)
+        await conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(start)} PARTITION OF query "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        ))
+
+
+async def drop_expired_partitions(conn: AsyncConnection, today: date, retention_months: int) -> List[str]:
+    """Drop partitions that only hold queries older than ``retention_months`` full months."""
+    cutoff = month_start(today, -retention_months)
+    result = await conn.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = 'query'"
+    ))
+    dropped = []
+    for (name,) in result:
+        match = _PARTITION_NAME.match(name)
+        if match is None:
+            continue
+        start = date(int(match.group(1)), int(match.group(2)), 1)
+        if month_start(start, 1) <= cutoff:
+            await conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            dropped.append(name)
+    return dropped
+
+
+async def update_daily_rollups(conn: AsyncConnection, first_day: date, last_day: date) -> None:
+    """
+    Recompute per-user query counts and latency for each day in the range.
+
+    Days are recomputed in full, so rows written late by the query log are
+    picked up by the next run.
+    """
+    day = cast(Query.created_at, Date)
+    summary = select(
+        day,
+        Query.user_id,
+        func.count(),
+        func.avg(Query.latency_ms),
+        func.percentile_cont(0.95).within_group(Query.latency_ms),
+        func.max(Query.latency_ms),
+    ).where(
+        Query.created_at >= datetime.combine(first_day, datetime.min.time()),
+        Query.created_at < datetime.combine(last_day + timedelta(days=1), datetime.min.time()),
+        Query.user_id.isnot(None),
+    ).group_by(day, Query.user_id)
+
+    statement = insert(QueryDailyRollup).from_select(
+        ["day", "user_id", "query_count", "latency_ms_avg", "latency_ms_p95", "latency_ms_max"],
+        summary,
+    )
+    await conn.execute(statement.on_conflict_do_update(
+        index_elements=[QueryDailyRollup.day, QueryDailyRollup.user_id],
+        set_={
+            "query_count": statement.excluded.query_count,
+            "latency_ms_avg": statement.excluded.latency_ms_avg,
+            "latency_ms_p95": statement.excluded.latency_ms_p95,
+            "latency_ms_max": statement.excluded.latency_ms_max,
+        },
+    ))
+
+
+class QueryHistoryMaintenance:
+    """
+    Keep the partitioned ``query`` table in shape.
+
+    Every ``interval`` seconds: create partitions for the coming months,
+    refresh the daily rollups of the last few days, then drop partitions
+    past the retention period. Runs once on startup, before requests are
+    served, so the current month's partition always exists. Processes take
+    an advisory lock, so only one of them does the work at a time.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> None:
+        today = datetime.now(timezone.utc).date()
+        async with async_engine.begin() as conn:
+            locked = (await conn.execute(
+                select(func.pg_try_advisory_xact_lock(MAINTENANCE_LOCK_KEY))
+            )).scalar_one()
+            if not locked:
+                return
+            await create_partitions(conn, today, settings.QUERY_PARTITION_MONTHS_AHEAD)
+            await update_daily_rollups(
+                conn, today - timedelta(days=settings.QUERY_ROLLUP_LOOKBACK_DAYS), today
+            )
+            dropped = await drop_expired_partitions(conn, today, settings.QUERY_RETENTION_MONTHS)
+        if dropped:
+            logger.info("Dropped expired query partitions: %s", ", ".join(dropped))
+
+    async def start(self) -> None:
+        await self.run_once()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Query history maintenance failed")
+
+
+# Create a global instance
+query_history_maintenance = QueryHistoryMaintenance(
+    interval=settings.QUERY_MAINTENANCE_INTERVAL_SECONDS
+)
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, insert, select
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.query import QUERY_ID_BLOCK_SIZE, Query, query_id_sequence
+
+logger = logging.getLogger(__name__)
+
+# A logged query, with the same keys as the ``query`` table's columns
+QueryRecord = Dict[str, Any]
+
+
+class QueryLogWriter:
+    """
+    Write-behind log of answered queries.
+
+    ``record`` assigns the query its ID and returns at once; records are
+    buffered and inserted in batches of up to ``batch_size`` rows by a
+    background task, about ``flush_interval`` seconds after they arrive.
+    Query IDs come from blocks reserved in the database, so IDs are unique
+    across processes while only one in QUERY_ID_BLOCK_SIZE queries waits for
+    the database. The buffer
+    holds at most ``max_buffer`` records, beyond which ``record`` waits for
+    the writer to catch up. Whatever is buffered is flushed on shutdown.
+
+    Until a record is written, ``get_pending`` and ``list_pending`` return
+    it, so clients can read back a query they just made. This has two
+    limits:
+
+    - The buffer belongs to the process. With several workers, a read
+      served by a different process than the one that answered the query
+      returns 404 (or omits the query from listings) until its batch is
+      flushed, normally within ``flush_interval`` seconds.
+    - Records are not durable until flushed. A batch that still fails
+      after ``max_retries`` retries is dropped and logged, and so is
+      whatever is buffered if the process dies. Query IDs that were
+      already returned to clients then never resolve.
+    """
+
+    def __init__(self, max_buffer: int, batch_size: int, flush_interval: float, max_retries: int):
+        self.max_buffer = max_buffer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, QueryRecord] = {}
+        self._id_lock: Optional[asyncio.Lock] = None
+        self._next_id = 0
+        self._id_limit = 0
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.max_buffer)
+        self._id_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the writer after flushing every buffered record."""
+        if self._task is None:
+            return
+        # Queued behind the buffered records, so everything before it is written
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def _allocate_id(self) -> int:
+        async with self._id_lock:
+            if self._next_id >= self._id_limit:
+                # Reserve the next block of IDs; other processes get other blocks
+                async with AsyncSessionLocal() as db:
+                    start = (await db.execute(select(func.next_value(query_id_sequence)))).scalar_one()
+                self._next_id, self._id_limit = start, start + QUERY_ID_BLOCK_SIZE
+            query_id = self._next_id
+            self._next_id += 1
+            return query_id
+
+    async def record(
+        self,
+        query_text: str,
+        user_id: int,
+        document_id: Optional[int],
+        response: str,
+        search_mode: Optional[str] = None,
+        latency_ms: Optional[float] = None,
+    ) -> QueryRecord:
+        """Buffer a query for writing and return it, with its ID and creation time."""
+        record = {
+            "id": await self._allocate_id(),
+            "query_text": query_text,
+            "response": response,
+            "search_mode": search_mode,
+            "latency_ms": latency_ms,
+            "user_id": user_id,
+            "document_id": document_id,
+            # Naive UTC, like the func.now() default
+            "created_at": datetime.now(timezone.utc).replace(tzinfo=None),
+        }
+        self._pending[record["id"]] = record
+        await self._queue.put(record)
+        return record
+
+    def get_pending(self, query_id: int) -> Optional[QueryRecord]:
+        return self._pending.get(query_id)
+
+    def list_pending(self, user_id: int, document_id: Optional[int] = None) -> List[QueryRecord]:
+        return [
+            record for record in self._pending.values()
+            if record["user_id"] == user_id and (document_id is None or record["document_id"] == document_id)
+        ]
+
+    def _take_batch(self, batch: List[QueryRecord]) -> bool:
+        """Add buffered records to ``batch``; returns False once the stop marker is reached."""
+        while len(batch) < self.batch_size and not self._queue.empty():
+            record = self._queue.get_nowait()
+            if record is None:
+                return False
+            batch.append(record)
+        return True
+
+    async def _run(self) -> None:
+        running = True
+        while running:
+            # Wait for the first record, then give others until the interval is up to arrive
+            first = await self._queue.get()
+            if first is None:
+                break
+            await asyncio.sleep(self.flush_interval)
+            batch = [first]
+            running = self._take_batch(batch)
+            await self._flush(batch)
+            while running and self._queue.qsize() >= self.batch_size:
+                batch = []
+                running = self._take_batch(batch)
+                await self._flush(batch)
+
+    async def _flush(self, batch: List[QueryRecord]) -> None:
+        if not batch:
+            return
+        for attempt in range(1, self.max_retries + 2):
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(insert(Query.__table__), batch)
+                    await db.commit()
+                break
+            except Exception:
+                if attempt > self.max_retries:
+                    logger.exception("Dropping %s query records after %s failed attempts", len(batch), attempt)
+                    break
+                logger.warning("Failed to write %s query records (attempt %s), retrying", len(batch), attempt)
+                await asyncio.sleep(min(self.flush_interval * 2 ** attempt, 30.0))
+        for record in batch:
+            self._pending.pop(record["id"], None)
+
+
+# Create a global instance
+query_log = QueryLogWriter(
+    max_buffer=settings.QUERY_LOG_MAX_BUFFER,
+    batch_size=settings.QUERY_LOG_BATCH_SIZE,
+    flush_interval=settings.QUERY_LOG_FLUSH_INTERVAL_SECONDS,
+    max_retries=settings.QUERY_LOG_MAX_RETRIES
+)
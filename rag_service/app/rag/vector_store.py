@@ -0,0 +1,129 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+from app.core.config import settings
+
+
+class SearchResult(NamedTuple):
+    id: str
+    content: str
+    metadata: Dict[str, Any]
+    score: float  # Cosine similarity; higher is more similar
+
+
+class VectorStore(ABC):
+    """
+    Storage and similarity search for chunk embeddings.
+
+    Every vector carries a ``document_id`` in its metadata, and searches can
+    be restricted to one document. Embeddings are expected to be
+    L2-normalized, so inner product and cosine similarity agree.
+    """
+
+    @abstractmethod
+    def add(
+        self,
+        ids: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+        texts: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+    ) -> None:
+        """Insert vectors, replacing any that already exist under the same IDs."""
+
+    @abstractmethod
+    def delete(self, ids: Sequence[str]) -> None:
+        """Remove vectors by ID."""
+
+    @abstractmethod
+    def delete_document(self, document_id: int) -> None:
+        """Remove all vectors of a document."""
+
+    @abstractmethod
+    def reassign_document(self, old_document_id: int, new_document_id: int) -> None:
+        """Move a document's vectors to another document ID."""
+
+    @abstractmethod
+    def search(
+        self,
+        query_embedding: Sequence[float],
+        top_k: int,
+        document_id: Optional[int] = None,
+    ) -> List[SearchResult]:
+        """Return the ``top_k`` most similar vectors, best first."""
+
+    def persist(self) -> None:
+        """Flush pending changes to disk, for backends that buffer them."""
+
+
+class ChromaVectorStore(VectorStore):
+    """Vector store backed by a persistent Chroma collection."""
+
+    # Name used by the earlier LangChain integration, kept so existing data is still found
+    COLLECTION_NAME = "langchain"
+
+    def __init__(self, persist_directory: str):
+        import chromadb
+
+        self.client = chromadb.PersistentClient(path=persist_directory)
+        self.collection = self.client.get_or_create_collection(self.COLLECTION_NAME)
+
+    def add(self, ids, embeddings, texts, metadatas) -> None:
+        self.collection.upsert(
+            ids=list(ids),
+            embeddings=[list(e) for e in embeddings],
+            documents=list(texts),
+            metadatas=list(metadatas),
+        )
+
+    def delete(self, ids) -> None:
+        if ids:
+            self.collection.delete(ids=list(ids))
+
+    def delete_document(self, document_id: int) -> None:
+        self.collection.delete(where={"document_id": document_id})
+
+    def reassign_document(self, old_document_id: int, new_document_id: int) -> None:
+        existing = self.collection.get(where={"document_id": old_document_id}, include=["metadatas"])
+        if not existing["ids"]:
+            return
+        metadatas = [
+            {**metadata, "document_id": new_document_id}
+            for metadata in existing["metadatas"]
+        ]
+        self.collection.update(ids=existing["ids"], metadatas=metadatas)
+
+    def search(self, query_embedding, top_k, document_id=None) -> List[SearchResult]:
+        results = self.collection.query(
+            query_embeddings=[list(query_embedding)],
+            n_results=top_k,
+            where={"document_id": document_id} if document_id is not None else None,
+            include=["documents", "metadatas", "distances"],
+        )
+        return [
+            # Chroma returns squared L2 distance; for unit vectors d = 2 - 2 * cos
+            SearchResult(id_, content, metadata, 1.0 - distance / 2.0)
+            for id_, content, metadata, distance in zip(
+                results["ids"][0],
+                results["documents"][0],
+                results["metadatas"][0],
+                results["distances"][0],
+            )
+        ]
+
+
+def get_vector_store() -> VectorStore:
+    """Build the vector store selected by VECTOR_DB_TYPE."""
+    if settings.VECTOR_DB_TYPE == "chroma":
+        return ChromaVectorStore(settings.VECTOR_DB_PERSIST_DIR)
+    if settings.VECTOR_DB_TYPE == "faiss":
+        from app.rag.faiss_store import FaissVectorStore
+
+        return FaissVectorStore(
+            settings.VECTOR_DB_PERSIST_DIR,
+            index_type=settings.FAISS_INDEX_TYPE,
+        )
+    if settings.VECTOR_DB_TYPE == "numpy":
+        from app.rag.numpy_store import NumpyVectorStore
+
+        return NumpyVectorStore(settings.VECTOR_DB_PERSIST_DIR)
+    raise ValueError(f"Unsupported VECTOR_DB_TYPE {settings.VECTOR_DB_TYPE!r}")
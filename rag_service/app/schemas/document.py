@@ -15,6 +15,7 @@ class ChunkCreate(ChunkBase):
 class Chunk(ChunkBase):
     id: int
     document_id: int
+    chunk_index: Optional[int] = None
     created_at: datetime
 
     class Config:
@@ -39,6 +40,9 @@ class DocumentUpdate(DocumentBase):
 class Document(DocumentBase):
     id: int
     file_path: Optional[str] = None
+    content_hash: Optional[str] = None
+    file_size: Optional[int] = None
+    source_document_id: Optional[int] = None
     embedding_status: bool
     user_id: int
     created_at: datetime
@@ -46,4 +50,24 @@ class Document(DocumentBase):
     chunks: List[Chunk] = []
 
     class Config:
-        orm_mode = True 
\ No newline at end of file
+        orm_mode = True 
+
+class DocumentSummary(BaseModel):
+    """Document metadata without its content or chunks."""
+    id: int
+    title: str
+    file_type: Optional[str] = None
+    file_size: Optional[int] = None
+    source_document_id: Optional[int] = None
+    embedding_status: bool
+    chunk_count: int = 0
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        orm_mode = True
+
+
+class DocumentSummaryPage(BaseModel):
+    items: List[DocumentSummary]
+    next_cursor: Optional[str] = None  # Pass as ``cursor`` to get the next page; None on the last page
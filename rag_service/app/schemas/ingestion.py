@@ -0,0 +1,21 @@
+from typing import Dict, Optional
+from datetime import datetime
+from pydantic import BaseModel
+
+
+class IngestionJob(BaseModel):
+    id: int
+    document_id: int
+    status: str
+    stage: str
+    chunks_total: int = 0
+    chunks_processed: int = 0
+    timings: Dict[str, float] = {}
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
@@ -1,15 +1,22 @@
+from enum import Enum
 from typing import Optional
-from datetime import datetime
+from datetime import date, datetime
 from pydantic import BaseModel
 
 
+class SearchMode(str, Enum):
+    vector = "vector"
+    hybrid = "hybrid"
+    keyword = "keyword"
+
+
 class QueryBase(BaseModel):
     query_text: str
     document_id: Optional[int] = None
 
 
 class QueryCreate(QueryBase):
-    pass
+    search_mode: SearchMode = SearchMode.vector
 
 
 class Query(QueryBase):
@@ -19,4 +26,15 @@ class Query(QueryBase):
     created_at: datetime
 
     class Config:
-        orm_mode = True 
\ No newline at end of file
+        orm_mode = True 
+
+
+class QueryDailyStats(BaseModel):
+    day: date
+    query_count: int
+    latency_ms_avg: Optional[float] = None
+    latency_ms_p95: Optional[float] = None
+    latency_ms_max: Optional[float] = None
+
+    class Config:
+        orm_mode = True
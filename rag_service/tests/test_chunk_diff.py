@@ -0,0 +1,96 @@
+from typing import List, Sequence
+
+from app.rag.chunk_diff import ChunkDiffer, StoredChunk, chunk_hash
+
+
+def stored(texts: Sequence[str], document_id: int = 1) -> List[StoredChunk]:
+    """Chunks as they would be stored after first processing ``texts``."""
+    diff = ChunkDiffer([], document_id).feed(texts)
+    return [
+        StoredChunk(id_, chunk.content_hash, chunk.chunk_index, chunk.embedding_id)
+        for id_, chunk in enumerate(diff.added, start=1)
+    ]
+
+
+def test_first_processing_adds_every_chunk():
+    differ = ChunkDiffer([], 1)
+    diff = differ.feed(["a", "b"])
+    assert [(chunk.chunk_index, chunk.content) for chunk in diff.added] == [(0, "a"), (1, "b")]
+    assert diff.added[0].content_hash == chunk_hash("a")
+    assert diff.embedding_ids == [chunk.embedding_id for chunk in diff.added]
+    assert diff.moved == []
+    assert differ.finish() == []
+
+
+def test_unchanged_document_keeps_everything():
+    existing = stored(["a", "b", "c"])
+    differ = ChunkDiffer(existing, 1)
+    diff = differ.feed(["a", "b", "c"])
+    assert diff.added == [] and diff.moved == []
+    assert diff.embedding_ids == [chunk.embedding_id for chunk in existing]
+    assert differ.finish() == []
+
+
+def test_insertion_moves_later_chunks_and_keeps_their_vectors():
+    existing = stored(["a", "b"])
+    differ = ChunkDiffer(existing, 1)
+    diff = differ.feed(["new", "a", "b"])
+    assert [chunk.content for chunk in diff.added] == ["new"]
+    assert [(chunk.id, index) for chunk, index in diff.moved] == [(1, 1), (2, 2)]
+    assert diff.embedding_ids[1:] == [existing[0].embedding_id, existing[1].embedding_id]
+    assert differ.finish() == []
+
+
+def test_unmatched_stored_chunks_are_removed_at_finish():
+    existing = stored(["a", "b", "c"])
+    differ = ChunkDiffer(existing, 1)
+    diff = differ.feed(["a", "c"])
+    assert diff.added == []
+    assert [(chunk.id, index) for chunk, index in diff.moved] == [(3, 1)]
+    assert differ.finish() == [existing[1]]
+
+
+def test_repeated_texts_match_in_order_and_get_distinct_ids():
+    existing = stored(["x", "y", "x"])
+    assert existing[0].embedding_id != existing[2].embedding_id
+    differ = ChunkDiffer(existing, 1)
+    diff = differ.feed(["x", "x", "x"])
+    # The first two "x" keep the stored chunks in order; the third is new
+    assert diff.embedding_ids[:2] == [existing[0].embedding_id, existing[2].embedding_id]
+    assert [(chunk.id, index) for chunk, index in diff.moved] == [(3, 1)]
+    assert [chunk.chunk_index for chunk in diff.added] == [2]
+    assert diff.added[0].embedding_id not in {chunk.embedding_id for chunk in existing}
+    assert differ.finish() == [existing[1]]
+
+
+def test_embedding_ids_of_removed_chunks_are_not_reused():
+    # A chunk stored before content hashes existed, whose ID the new chunk would otherwise get
+    base = f"doc_1_{chunk_hash('a')[:32]}"
+    legacy = [StoredChunk(1, None, 0, base)]
+    differ = ChunkDiffer(legacy, 1)
+    diff = differ.feed(["a"])
+    # Its vector is deleted after the new ones are written, so the new chunk needs another ID
+    assert diff.added[0].embedding_id == f"{base}_1"
+    assert differ.finish() == legacy
+
+
+def test_chunks_without_a_hash_are_replaced():
+    legacy = [StoredChunk(1, None, 0, "legacy_0")]
+    differ = ChunkDiffer(legacy, 1)
+    diff = differ.feed(["a"])
+    assert [chunk.content for chunk in diff.added] == ["a"]
+    assert differ.finish() == legacy
+
+
+def test_feeding_in_batches_matches_one_feed():
+    existing = stored(["a", "b", "c", "d"])
+    texts = ["d", "a", "e", "b", "e"]
+    whole = ChunkDiffer(existing, 1)
+    whole_diff = whole.feed(texts)
+    batched = ChunkDiffer(existing, 1)
+    diffs = [batched.feed(texts[i:i + 2]) for i in range(0, len(texts), 2)]
+    assert [chunk for diff in diffs for chunk in diff.added] == whole_diff.added
+    assert [move for diff in diffs for move in diff.moved] == whole_diff.moved
+    assert [id_ for diff in diffs for id_ in diff.embedding_ids] == whole_diff.embedding_ids
+    assert batched.finish() == whole.finish()
+    assert batched.chunk_count == len(texts)
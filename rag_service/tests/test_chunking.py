@@ -0,0 +1,136 @@
+import random
+
+import numpy as np
+import pytest
+import tiktoken
+
+from app.rag.chunking import ANY, PARAGRAPH, SENTENCE, WORD, TokenChunker, boundary_levels
+
+WORDS = (
+    "the of and to in is that for it as was with be by on not this are or from at which but have "
+    "document retrieval embedding vector search index query response chunk token paragraph model"
+).split()
+
+# Same pre-tokenization as the GPT-2 encoding
+PAT_STR = r"""'s|'t|'re|'ve|'m|'ll|'d| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+"""
+
+
+@pytest.fixture(scope="module")
+def encoding():
+    """
+    A small self-contained encoding, so the tests need no download.
+
+    Every byte is a token, and the words above (with or without a leading
+    space or capital) merge into one token each.
+    """
+    ranks = {bytes([i]): i for i in range(256)}
+    for word in WORDS:
+        for form in (word, " " + word, word.capitalize(), " " + word.capitalize()):
+            data = form.encode()
+            for k in range(2, len(data) + 1):
+                ranks.setdefault(data[:k], len(ranks))
+    return tiktoken.Encoding("test", pat_str=PAT_STR, mergeable_ranks=ranks, special_tokens={})
+
+
+def make_chunker(encoding, chunk_tokens=50, min_tokens=30, overlap_tokens=0, max_tokens=100, encode_threads=1):
+    return TokenChunker(
+        "test",
+        chunk_tokens=chunk_tokens,
+        min_tokens=min_tokens,
+        overlap_tokens=overlap_tokens,
+        max_tokens=max_tokens,
+        encoding=encoding,
+        encode_threads=encode_threads,
+    )
+
+
+def sentence(rng, words):
+    return " ".join(rng.choices(WORDS, k=words)).capitalize() + "."
+
+
+def paragraphs(seed, count, sentences=3, words=5):
+    rng = random.Random(seed)
+    return [" ".join(sentence(rng, words) for _ in range(sentences)) for _ in range(count)]
+
+
+@pytest.mark.parametrize("sizes", [
+    dict(chunk_tokens=50, min_tokens=60, overlap_tokens=0, max_tokens=100),
+    dict(chunk_tokens=50, min_tokens=30, overlap_tokens=0, max_tokens=40),
+    dict(chunk_tokens=50, min_tokens=30, overlap_tokens=30, max_tokens=100),
+])
+def test_rejects_inconsistent_sizes(encoding, sizes):
+    with pytest.raises(ValueError):
+        make_chunker(encoding, **sizes)
+
+
+def test_boundary_levels():
+    data = "Hi. a\n\nbé".encode()
+    # One token per byte, so every byte offset is a possible cut
+    offsets = np.arange(len(data) + 1)
+    levels = dict(zip(range(1, len(data)), boundary_levels(data, offsets)))
+    assert levels[1] == ANY  # H|i
+    assert levels[3] == SENTENCE  # "Hi.| a"
+    assert levels[4] == WORD  # "Hi. |a"
+    assert levels[5] == PARAGRAPH  # "a|\n\nb"
+    assert levels[6] == SENTENCE  # "a\n|\nb"
+    assert levels[7] == PARAGRAPH  # "a\n\n|b"
+    assert levels[len(data) - 1] == -1  # inside the two bytes of "é"
+
+
+def test_chunks_end_at_paragraph_breaks_when_possible(encoding):
+    texts = paragraphs(seed=1, count=40)
+    chunks = make_chunker(encoding).split_text("\n\n".join(texts))
+    assert len(chunks) > 5
+    for chunk in chunks:
+        assert all(part in texts for part in chunk.split("\n\n"))
+        assert len(encoding.encode_ordinary(chunk)) <= 50
+
+
+def test_chunks_end_at_sentences_without_paragraph_breaks(encoding):
+    text = " ".join(paragraphs(seed=2, count=30))
+    chunks = make_chunker(encoding).split_text(text)
+    assert len(chunks) > 5
+    for chunk in chunks:
+        assert chunk[0].isupper() and chunk.endswith(".")
+    assert " ".join(chunks) == text
+
+
+def test_text_without_breaks_is_cut_at_the_hard_limit(encoding):
+    text = "é" * 400
+    chunker = make_chunker(encoding)
+    chunks = chunker.split_text(text)
+    assert "".join(chunks) == text
+    assert all(len(encoding.encode_ordinary(chunk)) <= chunker.max_tokens for chunk in chunks)
+
+
+def test_overlap_starts_at_a_word_and_stays_within_budget(encoding):
+    text = " ".join(paragraphs(seed=3, count=30))
+    chunker = make_chunker(encoding, overlap_tokens=10)
+    chunks = chunker.split_text(text)
+    assert len(chunks) > 5
+    for previous, chunk in zip(chunks, chunks[1:]):
+        shared = max(k for k in range(len(chunk) + 1) if previous.endswith(chunk[:k]))
+        assert shared > 0
+        assert f" {chunk[:shared]}" in f" {text}"  # starts at a word
+        assert len(encoding.encode_ordinary(chunk[:shared])) <= chunker.overlap_tokens
+
+
+def test_streamed_blocks_give_the_same_chunks(encoding):
+    text = "\n\n".join(paragraphs(seed=4, count=60)) + " naïve café"
+    chunker = make_chunker(encoding, overlap_tokens=10)
+    expected = chunker.split_text(text)
+    for block_size in (7, 100, 1000):
+        blocks = [text[i:i + block_size] for i in range(0, len(text), block_size)]
+        assert list(chunker.iter_chunks(blocks)) == expected
+
+
+def test_parallel_tokenizing_gives_the_same_tokens_and_chunks(encoding):
+    # Large enough to be cut into several pieces
+    text = "\n\n".join(paragraphs(seed=5, count=3000, sentences=4, words=8))
+    single = make_chunker(encoding, encode_threads=1)
+    parallel = make_chunker(encoding, encode_threads=4)
+    try:
+        np.testing.assert_array_equal(parallel._encode(text), encoding.encode_ordinary(text))
+        assert parallel.split_text(text) == single.split_text(text)
+    finally:
+        parallel.shutdown()
@@ -0,0 +1,39 @@
+import base64
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.cursors import decode_cursor, encode_cursor
+
+
+def raw_cursor(value: str) -> str:
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+@pytest.mark.parametrize("created_at", [datetime(2026, 1, 31, 23, 59, 59, 999999), datetime(2026, 2, 1)])
+def test_round_trip(created_at):
+    cursor = encode_cursor(created_at, 42)
+    assert decode_cursor(cursor) == (created_at, 42)
+    # Safe to pass in a query string as is
+    assert set(cursor) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_=")
+
+
+def test_offset_is_converted_to_naive_utc():
+    created_at, id_ = decode_cursor(raw_cursor("2026-01-01T01:30:00+02:00|7"))
+    assert (created_at, id_) == (datetime(2025, 12, 31, 23, 30), 7)
+    assert created_at.tzinfo is None
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    raw_cursor("2026-01-01T00:00:00"),
+    raw_cursor("2026-01-01T00:00:00|7|8"),
+    raw_cursor("yesterday|7"),
+    raw_cursor("2026-01-01T00:00:00|seven"),
+    base64.urlsafe_b64encode(b"\xff\xfe|1").decode(),
+])
+def test_malformed_cursor_is_a_client_error(cursor):
+    with pytest.raises(HTTPException) as excinfo:
+        decode_cursor(cursor)
+    assert excinfo.value.status_code == 400
@@ -0,0 +1,89 @@
+import itertools
+import types
+
+import pytest
+
+pytest.importorskip("langchain")
+
+from app.rag import embedding_cache as embedding_cache_module  # noqa: E402
+from app.rag.embedding_cache import CachedEmbeddings, EmbeddingCache  # noqa: E402
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Advance the cache's clock by a second on every read, so last-used times never tie."""
+    ticks = itertools.count(1)
+    monkeypatch.setattr(embedding_cache_module, "time", types.SimpleNamespace(time=lambda: float(next(ticks))))
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return EmbeddingCache(str(tmp_path / "cache.sqlite3"), max_entries=10)
+
+
+def test_key_ignores_whitespace_differences_but_not_model():
+    assert EmbeddingCache.key("m", "a  b\n") == EmbeddingCache.key("m", " a b")
+    assert EmbeddingCache.key("m", "a b") != EmbeddingCache.key("other", "a b")
+
+
+def test_round_trip_and_counters(cache):
+    keys = [EmbeddingCache.key("m", text) for text in ("a", "b")]
+    assert cache.get_many(keys) == [None, None]
+    cache.put_many(keys[:1], [[0.5, -1.0]])
+    assert cache.get_many(keys) == [[0.5, -1.0], None]
+    assert (cache.hits, cache.misses) == (1, 3)
+    assert cache.stats()["hit_ratio"] == 0.25
+
+
+def test_eviction_drops_least_recently_used(cache):
+    keys = [EmbeddingCache.key("m", str(i)) for i in range(11)]
+    for key in keys[:10]:
+        cache.put_many([key], [[1.0]])
+    # Reading the oldest entry makes it the most recently used
+    cache.get_many([keys[0]])
+    cache.put_many([keys[10]], [[1.0]])
+
+    # Going past max_entries evicts down to 90% of it in one go
+    assert cache.stats()["size"] == 9
+    assert cache.evictions == 2
+    found = cache.get_many(keys)
+    assert found[0] is not None
+    assert found[1] is None and found[2] is None
+    assert all(vector is not None for vector in found[3:])
+
+
+def test_inserting_an_existing_key_does_not_grow_the_cache(cache):
+    key = EmbeddingCache.key("m", "a")
+    cache.put_many([key], [[1.0]])
+    cache.put_many([key], [[2.0]])
+    assert cache.stats()["size"] == 1
+    assert cache.get_many([key]) == [[1.0]]
+
+
+def test_size_survives_reopening(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite3")
+    EmbeddingCache(path, max_entries=10).put_many([EmbeddingCache.key("m", "a")], [[1.0]])
+    assert EmbeddingCache(path, max_entries=10).stats()["size"] == 1
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text))] for text in texts]
+
+    def embed_query(self, text):
+        self.embedded.append(text)
+        return [float(len(text))]
+
+
+def test_cached_embeddings_embed_each_missing_text_once(cache):
+    provider = CountingEmbeddings()
+    embeddings = CachedEmbeddings(provider, model_name="m", cache=cache)
+
+    assert embeddings.embed_documents(["aa", "b", "aa"]) == [[2.0], [1.0], [2.0]]
+    assert embeddings.embed_documents(["b", "ccc"]) == [[1.0], [3.0]]
+    assert embeddings.embed_query("aa") == [2.0]
+    assert provider.embedded == ["aa", "b", "ccc"]
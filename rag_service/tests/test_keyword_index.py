@@ -0,0 +1,97 @@
+import math
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.rag.keyword_index import KeywordIndex, KeywordIndexBuilder, tokenize
+
+TEXTS = [
+    "The server returned ERR-404 for the upload.",
+    "Retry the upload after the server restarts.",
+    "Release v1.2.3 fixes the retry loop in the uploader.",
+    "Nothing relevant here, just a naïve sentence about über cafés.",
+]
+
+
+def build(tmp_path, texts, batch_size=None):
+    builder = KeywordIndexBuilder(str(tmp_path / "texts.bin"))
+    batch_size = batch_size or max(len(texts), 1)
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        builder.add([f"chunk_{start + i}" for i in range(len(batch))], batch)
+    return builder.finish()
+
+
+def reference_bm25(texts, query):
+    """Okapi BM25 written out term by term, to check the vectorized scoring against."""
+    k1, b = settings.BM25_K1, settings.BM25_B
+    documents = [Counter(tokenize(text)) for text in texts]
+    lengths = [sum(counts.values()) for counts in documents]
+    avg_length = sum(lengths) / len(lengths)
+    scores = []
+    for counts, length in zip(documents, lengths):
+        score = 0.0
+        for term in set(tokenize(query)):
+            df = sum(1 for other in documents if term in other)
+            if not df or term not in counts:
+                continue
+            idf = math.log(1 + (len(documents) - df + 0.5) / (df + 0.5))
+            tf = counts[term]
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_length))
+        scores.append(score)
+    return scores
+
+
+def test_tokenize_keeps_compound_identifiers_whole_and_split():
+    assert tokenize("See ERR-404 in v1.2.3, user_id!") == [
+        "see", "err-404", "err", "404", "in", "v1.2.3", "v1", "2", "3", "user_id", "user", "id",
+    ]
+
+
+@pytest.mark.parametrize("query", ["upload server", "retry", "err-404", "404", "über cafés", "the"])
+def test_scores_match_reference_bm25(tmp_path, query):
+    index = build(tmp_path, TEXTS)
+    np.testing.assert_allclose(index.score(query), reference_bm25(TEXTS, query), rtol=1e-5)
+
+
+def test_unknown_and_empty_queries_score_zero(tmp_path):
+    index = build(tmp_path, TEXTS)
+    assert not index.score("kubernetes").any()
+    assert not index.score("  ...  ").any()
+    assert index.search("kubernetes", top_k=3, document_id=1) == []
+
+
+def test_search_returns_top_k_in_score_order(tmp_path):
+    index = build(tmp_path, TEXTS)
+    results = index.search("the upload retry", top_k=2, document_id=7)
+    expected = sorted(range(len(TEXTS)), key=lambda i: -reference_bm25(TEXTS, "the upload retry")[i])[:2]
+    assert [result.id for result in results] == [f"chunk_{i}" for i in expected]
+    assert [result.content for result in results] == [TEXTS[i] for i in expected]
+    assert results[0].score >= results[1].score
+    assert results[0].metadata == {"document_id": 7, "chunk_index": expected[0]}
+
+
+def test_batches_build_the_same_index(tmp_path):
+    (tmp_path / "one").mkdir()
+    (tmp_path / "many").mkdir()
+    whole = build(tmp_path / "one", TEXTS)
+    batched = build(tmp_path / "many", TEXTS, batch_size=1)
+    for name in KeywordIndex.ARRAYS:
+        np.testing.assert_array_equal(getattr(whole, name), getattr(batched, name))
+    assert [batched.text(i) for i in range(len(TEXTS))] == TEXTS
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = build(tmp_path, TEXTS)
+    index.save(str(tmp_path / "index.npz"))
+    loaded = KeywordIndex.load(str(tmp_path / "index.npz"), str(tmp_path / "texts.bin"))
+    np.testing.assert_array_equal(loaded.score("upload retry"), index.score("upload retry"))
+    assert loaded.text(3) == TEXTS[3]
+
+
+def test_empty_index(tmp_path):
+    index = build(tmp_path, [])
+    assert len(index.score("anything")) == 0
+    assert index.search("anything", top_k=3, document_id=1) == []
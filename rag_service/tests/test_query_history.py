@@ -0,0 +1,31 @@
+from datetime import date
+
+import pytest
+
+# Importing the module creates the database engines, which need the drivers
+pytest.importorskip("asyncpg")
+pytest.importorskip("psycopg")
+
+from app.rag.query_history import _PARTITION_NAME, month_start, partition_name  # noqa: E402
+
+
+@pytest.mark.parametrize("day,months,expected", [
+    (date(2026, 5, 17), 0, date(2026, 5, 1)),
+    (date(2026, 5, 17), 1, date(2026, 6, 1)),
+    (date(2026, 11, 30), 2, date(2027, 1, 1)),
+    (date(2026, 1, 1), -1, date(2025, 12, 1)),
+    (date(2026, 3, 31), -14, date(2025, 1, 1)),
+])
+def test_month_start(day, months, expected):
+    assert month_start(day, months) == expected
+
+
+def test_partition_names_sort_by_month_and_parse_back():
+    months = [month_start(date(2025, 11, 1), offset) for offset in range(4)]
+    names = [partition_name(month) for month in months]
+    assert names == ["query_p2025_11", "query_p2025_12", "query_p2026_01", "query_p2026_02"]
+    assert names == sorted(names)
+    for month, name in zip(months, names):
+        match = _PARTITION_NAME.match(name)
+        assert date(int(match.group(1)), int(match.group(2)), 1) == month
+    assert _PARTITION_NAME.match("query_daily_rollup") is None
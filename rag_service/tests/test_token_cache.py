@@ -0,0 +1,139 @@
+import asyncio
+import time
+
+import pytest
+from jose import jwt
+
+from app.core.auth.token_cache import TokenCache
+
+
+def make_loader(value, calls):
+    async def loader():
+        calls.append(value)
+        return value
+    return loader
+
+
+def test_hit_after_load():
+    cache = TokenCache(max_size=10, ttl=30)
+    calls = []
+
+    async def run():
+        first = await cache.get_or_load("token", make_loader("user", calls))
+        second = await cache.get_or_load("token", make_loader("other", calls))
+        return first, second
+
+    assert asyncio.run(run()) == ("user", "user")
+    assert calls == ["user"]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_entry_expires_after_ttl():
+    cache = TokenCache(max_size=10, ttl=0.01)
+    calls = []
+
+    async def run():
+        await cache.get_or_load("token", make_loader("old", calls))
+        await asyncio.sleep(0.05)
+        return await cache.get_or_load("token", make_loader("new", calls))
+
+    assert asyncio.run(run()) == "new"
+    assert calls == ["old", "new"]
+
+
+def test_entry_never_outlives_token_expiry():
+    cache = TokenCache(max_size=10, ttl=30)
+    expired = jwt.encode({"sub": "1", "exp": int(time.time()) - 10}, "key", algorithm="HS256")
+    valid = jwt.encode({"sub": "1", "exp": int(time.time()) + 3600}, "key", algorithm="HS256")
+    calls = []
+
+    async def run():
+        for token in (expired, expired, valid, valid):
+            await cache.get_or_load(token, make_loader(token, calls))
+
+    asyncio.run(run())
+    assert calls == [expired, expired, valid]
+
+
+def test_concurrent_misses_share_one_load():
+    cache = TokenCache(max_size=10, ttl=30)
+    calls = []
+
+    async def run():
+        gate = asyncio.Event()
+
+        async def loader():
+            calls.append(1)
+            await gate.wait()
+            return "user"
+
+        waiters = [asyncio.ensure_future(cache.get_or_load("token", loader)) for _ in range(3)]
+        await asyncio.sleep(0)
+        gate.set()
+        return await asyncio.gather(*waiters)
+
+    assert asyncio.run(run()) == ["user"] * 3
+    assert calls == [1]
+    assert cache.coalesced == 2
+
+
+def test_cancelled_waiter_does_not_cancel_shared_load():
+    cache = TokenCache(max_size=10, ttl=30)
+
+    async def run():
+        gate = asyncio.Event()
+
+        async def loader():
+            await gate.wait()
+            return "user"
+
+        first = asyncio.ensure_future(cache.get_or_load("token", loader))
+        second = asyncio.ensure_future(cache.get_or_load("token", loader))
+        await asyncio.sleep(0)
+        first.cancel()
+        gate.set()
+        return await second
+
+    assert asyncio.run(run()) == "user"
+
+
+def test_failed_load_reaches_every_waiter_and_is_not_cached():
+    cache = TokenCache(max_size=10, ttl=30)
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0)
+        raise RuntimeError("user service down")
+
+    async def run():
+        results = await asyncio.gather(
+            cache.get_or_load("token", failing),
+            cache.get_or_load("token", failing),
+            return_exceptions=True,
+        )
+        assert all(isinstance(result, RuntimeError) for result in results)
+        return await cache.get_or_load("token", make_loader("user", calls))
+
+    assert asyncio.run(run()) == "user"
+    assert calls == [1, "user"]
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TokenCache(max_size=2, ttl=30)
+    calls = []
+
+    async def run():
+        for token in ("a", "b", "a", "c", "a", "b"):
+            await cache.get_or_load(token, make_loader(token, calls))
+
+    asyncio.run(run())
+    # "b" was the least recently used when "c" arrived
+    assert calls == ["a", "b", "c", "b"]
+
+
+@pytest.mark.parametrize("hits,misses,ratio", [(0, 0, 0.0), (3, 1, 0.75)])
+def test_stats_hit_ratio(hits, misses, ratio):
+    cache = TokenCache(max_size=10, ttl=30)
+    cache.hits, cache.misses = hits, misses
+    assert cache.stats()["hit_ratio"] == ratio
@@ -0,0 +1,103 @@
+import time
+
+import pytest
+from jose import jwt
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.core.auth.jwt_verifier import local_token_verifier
+from app.core.config import settings
+from app.core.tracing import TracingMiddleware, span
+
+
+async def home(request):
+    with span("work"):
+        return PlainTextResponse("ok")
+
+
+@pytest.fixture
+def client():
+    app = Starlette(routes=[Route("/", home)])
+    app.add_middleware(TracingMiddleware)
+    return TestClient(app)
+
+
+@pytest.fixture
+def header_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "TRACE_HEADER_ENABLED", True)
+    monkeypatch.setattr(settings, "TRACE_HEADER_SECRET", "s3cret")
+    monkeypatch.setattr(settings, "TRACE_SAMPLE_RATE", 0.0)
+
+
+@pytest.fixture
+def local_auth(monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_MODE", "local")
+    monkeypatch.setattr(local_token_verifier, "_key", "jwt-key")
+
+
+def token(is_superuser, is_active=True):
+    claims = {
+        "sub": "1",
+        "email": "user@example.com",
+        "is_active": is_active,
+        "is_superuser": is_superuser,
+        "exp": int(time.time()) + 60,
+    }
+    return jwt.encode(claims, "jwt-key", algorithm=settings.JWT_ALGORITHM)
+
+
+def traced(response):
+    return "x-trace-id" in response.headers
+
+
+def test_header_is_ignored_by_default(client, monkeypatch):
+    monkeypatch.setattr(settings, "TRACE_SAMPLE_RATE", 0.0)
+    assert settings.TRACE_HEADER_ENABLED is False
+    response = client.get("/", headers={"X-Trace": "profile", "X-Trace-Secret": "anything"})
+    assert not traced(response)
+    assert "server-timing" not in response.headers
+
+
+@pytest.mark.parametrize("headers", [
+    {"X-Trace": "1"},
+    {"X-Trace": "1", "X-Trace-Secret": "wrong"},
+    {"X-Trace": "no", "X-Trace-Secret": "s3cret"},
+])
+def test_header_needs_the_secret(client, header_enabled, headers):
+    assert not traced(client.get("/", headers=headers))
+
+
+@pytest.mark.parametrize("value", ["1", "true", "profile", " Profile "])
+def test_header_with_the_secret_is_traced(client, header_enabled, value):
+    response = client.get("/", headers={"X-Trace": value, "X-Trace-Secret": "s3cret"})
+    assert traced(response)
+    assert response.headers["server-timing"].startswith("work;dur=")
+
+
+def test_no_secret_configured_means_no_one_can_opt_in(client, header_enabled, monkeypatch):
+    monkeypatch.setattr(settings, "TRACE_HEADER_SECRET", None)
+    assert not traced(client.get("/", headers={"X-Trace": "1", "X-Trace-Secret": ""}))
+
+
+@pytest.mark.parametrize("bearer,expected", [
+    (lambda: token(is_superuser=True), True),
+    (lambda: token(is_superuser=False), False),
+    (lambda: token(is_superuser=True, is_active=False), False),
+    (lambda: "not-a-jwt", False),
+])
+def test_superuser_token_works_with_local_auth(client, header_enabled, local_auth, bearer, expected):
+    response = client.get("/", headers={"X-Trace": "1", "Authorization": f"Bearer {bearer()}"})
+    assert traced(response) is expected
+
+
+def test_superuser_token_is_not_checked_with_remote_auth(client, header_enabled, monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_MODE", "remote")
+    response = client.get("/", headers={"X-Trace": "1", "Authorization": f"Bearer {token(is_superuser=True)}"})
+    assert not traced(response)
+
+
+def test_sampling_traces_without_the_header(client, monkeypatch):
+    monkeypatch.setattr(settings, "TRACE_SAMPLE_RATE", 1.0)
+    assert traced(client.get("/"))
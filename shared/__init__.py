@@ -0,0 +1 @@
+"""Code used by more than one service."""
@@ -0,0 +1,117 @@
+"""
+Prometheus metrics common to every service.
+
+Services run with the repository root (``/packages`` in the images) on
+``PYTHONPATH``, so this package is imported as ``shared.metrics`` alongside
+each service's own ``app`` package.
+"""
+import time
+from typing import Any, Callable, Dict, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, Gauge, Histogram, generate_latest
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Requests that matched no route share one label, so scanners can't blow up the series count
+UNMATCHED_ROUTE = "<unmatched>"
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time to serve an HTTP request, by route template and status code.",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests currently being served.",
+    ["method"],
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Connections in a database pool, by state.",
+    ["pool", "state"],
+)
+
+
+def register_pool(name: str, pool: Any) -> None:
+    """
+    Report a SQLAlchemy connection pool's usage, read at scrape time.
+
+    Pools without a fixed size (such as ``NullPool``) have nothing to report
+    and are skipped.
+    """
+    if not hasattr(pool, "checkedout"):
+        return
+    states: Dict[str, Callable[[], float]] = {
+        "checked_out": pool.checkedout,
+        "idle": pool.checkedin,
+        # SQLAlchemy counts unused pool capacity as negative overflow
+        "overflow": lambda: max(pool.overflow(), 0),
+        "size": pool.size,
+    }
+    for state, read in states.items():
+        DB_POOL_CONNECTIONS.labels(name, state).set_function(read)
+
+
+def route_template(scope: Scope) -> str:
+    """Path template of the route that served a request, once routing is done."""
+    # Newer FastAPI releases match the route inside the included router and
+    # record its full path separately
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    if context is not None:
+        return context.path
+    # Otherwise the router stores the matched route in the (shared) scope
+    route = scope.get("route")
+    return getattr(route, "path", UNMATCHED_ROUTE)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording the latency and status of every HTTP request.
+
+    Requests are labelled with the template of the route that served them
+    (``/api/v1/documents/{document_id}``), read from the scope once routing
+    is done, rather than with the raw path. Label children are cached, so a
+    request costs a couple of ``perf_counter`` calls and a dictionary lookup
+    on top of the histogram update.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._durations: Dict[Tuple[str, str, int], Any] = {}
+        self._in_progress: Dict[str, Any] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        in_progress = self._in_progress.get(method)
+        if in_progress is None:
+            in_progress = self._in_progress[method] = REQUESTS_IN_PROGRESS.labels(method)
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            in_progress.dec()
+            key = (method, route_template(scope), status_code)
+            duration = self._durations.get(key)
+            if duration is None:
+                duration = self._durations[key] = REQUEST_DURATION.labels(*key)
+            duration.observe(elapsed)
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    """Serve every metric in the Prometheus text exposition format."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -34,7 +34,14 @@ def login_access_token(
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     return {
         "access_token": security.create_access_token(
-            user.id, expires_delta=access_token_expires
+            user.id,
+            expires_delta=access_token_expires,
+            # Lets other services verify the token without calling back
+            claims={
+                "email": user.email,
+                "is_active": user.is_active,
+                "is_superuser": user.is_superuser,
+            },
         ),
         "token_type": "bearer",
     } 
\ No newline at end of file
@@ -2,8 +2,11 @@ from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 
+from shared.metrics import MetricsMiddleware, metrics_endpoint, register_pool
+
 from app.api.api_v1.api import api_router
 from app.core.config import settings
+from app.db.session import engine
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -21,7 +24,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Record the latency of every request, including those rejected by CORS
+app.add_middleware(MetricsMiddleware)
+register_pool("sync", engine.pool)
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
+app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
 
 @app.get("/")
 async def root():